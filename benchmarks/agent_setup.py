@@ -0,0 +1,88 @@
+"""
+Накладные расходы на подготовку агентов LLM к обработке одного сообщения.
+
+«до» — прежняя схема: на каждое сообщение создавался ParsingAgent (клиент ChatOpenAI
+и компиляция графа LangGraph), а в каждом вызове заново строились JsonOutputParser,
+инструкции формата и PromptTemplate.
+«после» — агенты из agent_registry создаются один раз, на сообщение остаётся
+только подстановка текста в готовый шаблон.
+
+Сетевые запросы не выполняются. Запуск из корня репозитория:
+    python -m benchmarks.agent_setup --repeat 200
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Callable
+
+from langchain.prompts import PromptTemplate
+from langchain_core.output_parsers import JsonOutputParser
+
+from consumer.llm.agents import ParsingAgent, agent_registry
+from consumer.llm.llm_states import RecipesList, SearchRecipesList
+
+CONTENT = "Борщ\nСвекла — 2 шт\nКапуста — 300 г\nСварить бульон, добавить овощи.\n" * 40
+
+
+def per_message_before() -> str:
+    agent = ParsingAgent()
+    parser = JsonOutputParser(pydantic_object=RecipesList)
+    prompt = PromptTemplate(
+        input_variables=["content"],
+        partial_variables={"format_instructions": parser.get_format_instructions()},
+        template=agent.prompt.template,
+    )
+    return prompt.format(content=CONTENT)
+
+
+def per_search_before() -> str:
+    parser = JsonOutputParser(pydantic_object=SearchRecipesList)
+    prompt = PromptTemplate(
+        input_variables=["query", "content"],
+        partial_variables={"format_instructions": parser.get_format_instructions()},
+        template=agent_registry.search.prompt.template,
+    )
+    return prompt.format(query="борщ", content=CONTENT)
+
+
+def per_message_after() -> str:
+    return agent_registry.parsing.prompt.format(content=CONTENT)
+
+
+def per_search_after() -> str:
+    return agent_registry.search.prompt.format(query="борщ", content=CONTENT)
+
+
+def bench(func: Callable[[], str], repeat: int) -> float:
+    func()  # прогрев
+    timings: list[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=100, help="число повторов каждого замера")
+    args = parser.parse_args()
+
+    await agent_registry.init()
+    cases = [
+        ("разбор страницы", per_message_before, per_message_after),
+        ("поиск", per_search_before, per_search_after),
+    ]
+
+    print(f"{'сценарий':<16} {'до, мс':>10} {'после, мс':>10} {'ускорение':>10}")
+    for name, before, after in cases:
+        before_ms, after_ms = bench(before, args.repeat), bench(after, args.repeat)
+        print(f"{name:<16} {before_ms:>10.3f} {after_ms:>10.3f} {before_ms / after_ms:>9.0f}x")
+
+    await agent_registry.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,120 @@
+"""
+Сравнение бэкендов эмбеддингов: PyTorch и ONNX Runtime с int8-квантизацией.
+
+Каждый бэкенд запускается в отдельном процессе, чтобы пиковая память (RSS) не
+смешивалась. Замеряются задержка эмбеддинга одного запроса (как в поиске),
+пропускная способность пакетного эмбеддинга чанков (как при добавлении рецепта)
+и близость векторов: косинус между эмбеддингами одного текста в torch и int8.
+Корпус — чанки текста страниц из --corpus (по умолчанию синтетические) и названия блюд как запросы.
+
+Первый запуск с onnx_int8 экспортирует модель в CACHE_DIR/onnx (около минуты).
+Запуск из корня репозитория:
+    python -m benchmarks.embedding_backends --corpus benchmarks/corpus
+"""
+
+import argparse
+import multiprocessing
+import resource
+import statistics
+import time
+from pathlib import Path
+
+from consumer.core.config import setting
+from consumer.utils.chunking import split_text
+from consumer.utils.html_extractors import extract_text
+
+CORPUS_DIR = Path(__file__).parent / "corpus"
+BACKENDS = ("torch", "onnx_int8")
+QUERIES = ["борщ", "блины на молоке", "куриный суп с лапшой", "салат оливье", "что приготовить на ужин из курицы"]
+
+
+def load_chunks(corpus_dir: Path) -> list[str]:
+    chunks: list[str] = []
+    for path in sorted(corpus_dir.glob("*.html")):
+        html = path.read_text(encoding="utf-8", errors="replace")
+        text = extract_text(html, setting.extract.extract_backend, setting.extract.extractor_options).text
+        chunks += [doc.page_content for doc in split_text(text, {}, setting.max_chunk_size, setting.chunk_overlap)]
+    if not chunks:
+        raise SystemExit(f"В каталоге {corpus_dir} нет страниц *.html")
+    return chunks
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # в Linux ru_maxrss в КБ
+
+
+def run_backend(backend: str, chunks: list[str], repeat: int, queue: multiprocessing.Queue) -> None:
+    from consumer.vectoring.models.embeddings import create_embeddings
+
+    setting.embedding.embedding_backend = backend
+    # замеряется сама модель, без кэша эмбеддингов и воркера
+    setting.embedding.embedding_cache_enabled = False
+    setting.embedding.embedding_worker_enabled = False
+    start = time.perf_counter()
+    embeddings = create_embeddings()
+    load_s = time.perf_counter() - start
+
+    documents = embeddings.embed_documents(chunks)  # прогрев и векторы для сравнения
+    queries = [embeddings.embed_query(query) for query in QUERIES]
+
+    batch_timings: list[float] = []
+    query_timings: list[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        embeddings.embed_documents(chunks)
+        batch_timings.append(time.perf_counter() - start)
+        for query in QUERIES:
+            start = time.perf_counter()
+            embeddings.embed_query(query)
+            query_timings.append(time.perf_counter() - start)
+
+    queue.put(
+        {
+            "load_s": load_s,
+            "query_ms": statistics.median(query_timings) * 1000,
+            "chunks_per_s": len(chunks) / statistics.median(batch_timings),
+            "rss_mb": peak_rss_mb(),
+            "vectors": documents + queries,
+        }
+    )
+
+
+def cosine(a: list[float], b: list[float]) -> float:
+    # эмбеддинги нормализованы, косинус равен скалярному произведению
+    return sum(x * y for x, y in zip(a, b))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", type=Path, default=CORPUS_DIR, help="каталог со страницами *.html")
+    parser.add_argument("--repeat", type=int, default=5, help="число повторов замера")
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.corpus)
+    print(f"Чанков: {len(chunks)}, запросов: {len(QUERIES)}, модель: {setting.embedding.embedding_model}\n")
+
+    context = multiprocessing.get_context("spawn")
+    results: dict[str, dict] = {}
+    for backend in BACKENDS:
+        queue = context.Queue()
+        process = context.Process(target=run_backend, args=(backend, chunks, args.repeat, queue))
+        process.start()
+        results[backend] = queue.get()
+        process.join()
+
+    print(f"{'бэкенд':<10} {'загрузка, с':>12} {'запрос, мс':>11} {'чанков/с':>9} {'пик RSS, МБ':>12}")
+    for backend, result in results.items():
+        print(
+            f"{backend:<10} {result['load_s']:>12.1f} {result['query_ms']:>11.2f} "
+            f"{result['chunks_per_s']:>9.0f} {result['rss_mb']:>12.0f}"
+        )
+
+    similarities = [cosine(a, b) for a, b in zip(results["torch"]["vectors"], results["onnx_int8"]["vectors"])]
+    print(
+        f"\nКосинус torch / onnx_int8: средний {statistics.mean(similarities):.4f}, "
+        f"минимальный {min(similarities):.4f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Сравнение бэкендов извлечения текста со страниц рецептов.
+
+Для каждого бэкенда из consumer.utils.html_extractors.EXTRACTORS замеряется
+пропускная способность на корпусе HTML-страниц и совпадение результата
+с эталонным бэкендом (bs4).
+
+Встроенный корпус benchmarks/corpus — небольшие синтетические страницы,
+повторяющие типичную разметку сайтов рецептов (меню, реклама, комментарии,
+подборки); цифры на нём показывают лишь порядок величин. Для оценки на
+реальных данных передайте каталог с сохранёнными страницами (*.html):
+    python -m benchmarks.html_extractors --corpus путь/к/страницам --repeat 20
+"""
+
+import argparse
+import difflib
+import statistics
+import time
+from pathlib import Path
+
+from consumer.core.config import setting
+from consumer.utils.html_extractors import EXTRACTORS, get_extractor
+
+CORPUS_DIR = Path(__file__).parent / "corpus"
+REFERENCE_BACKEND = "bs4"
+
+
+def load_corpus(corpus_dir: Path) -> dict[str, str]:
+    paths = sorted(corpus_dir.glob("*.html"))
+    pages = {path.name: path.read_text(encoding="utf-8", errors="replace") for path in paths}
+    if not pages:
+        raise SystemExit(f"В каталоге {corpus_dir} нет страниц *.html")
+    return pages
+
+
+def bench_backend(name: str, pages: dict[str, str], repeat: int) -> tuple[dict[str, str], list[float]]:
+    extractor = get_extractor(name, **setting.extract.extractor_options)
+    outputs = {page: extractor.extract(html).text for page, html in pages.items()}  # прогрев и эталон
+
+    timings: list[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for html in pages.values():
+            extractor.extract(html)
+        timings.append(time.perf_counter() - start)
+    return outputs, timings
+
+
+def similarity(reference: str, text: str) -> float:
+    return difflib.SequenceMatcher(None, reference.splitlines(), text.splitlines(), autojunk=False).ratio()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", type=Path, default=CORPUS_DIR, help="каталог со страницами *.html")
+    parser.add_argument("--repeat", type=int, default=10, help="число проходов по корпусу")
+    parser.add_argument("--backends", nargs="*", default=list(EXTRACTORS), help="бэкенды для сравнения")
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus)
+    total_mb = sum(len(html.encode("utf-8")) for html in pages.values()) / 1024 / 1024
+    print(f"Корпус: {len(pages)} страниц, {total_mb:.2f} МБ, проходов: {args.repeat}\n")
+
+    results = {name: bench_backend(name, pages, args.repeat) for name in args.backends}
+    reference = results.get(REFERENCE_BACKEND, next(iter(results.values())))[0]
+
+    print(f"{'бэкенд':<8} {'мс/проход':>10} {'стр/с':>8} {'МБ/с':>8} {'совпадение':>11} {'идентичных':>11}")
+    for name, (outputs, timings) in results.items():
+        median = statistics.median(timings)
+        ratios = [similarity(reference[page], outputs[page]) for page in pages]
+        identical = sum(reference[page] == outputs[page] for page in pages)
+        print(
+            f"{name:<8} {median * 1000:>10.1f} {len(pages) / median:>8.1f} {total_mb / median:>8.2f} "
+            f"{statistics.mean(ratios):>11.3f} {identical:>7}/{len(pages)}"
+        )
+
+    for name, (outputs, _) in results.items():
+        for page in pages:
+            ratio = similarity(reference[page], outputs[page])
+            if ratio < 0.99:
+                print(f"  {name}: {page} отличается от {REFERENCE_BACKEND} (совпадение {ratio:.3f})")
+
+
+if __name__ == "__main__":
+    main()
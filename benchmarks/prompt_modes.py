@@ -0,0 +1,67 @@
+"""
+Размер промптов ParsingAgent и SearchAgent в разных режимах llm_prompt_mode.
+
+Число входных токенов считается локально токенизатором tiktoken для модели агента,
+без обращения к API; если словарь tiktoken недоступен офлайн, выводится число символов.
+Для режима structured к промпту добавляется JSON-схема функции, которую модель
+получает через function calling. Фактический расход токенов во время
+работы потребителя пишется в лог (consumer.llm.usage.token_usage).
+
+Запуск из корня репозитория:
+    python -m benchmarks.prompt_modes --page benchmarks/corpus/borsch_article.html
+"""
+
+import argparse
+import json
+from pathlib import Path
+from typing import Callable
+
+import tiktoken
+
+from consumer.core.config import setting
+from consumer.llm.agents import ParsingAgent, SearchAgent
+from consumer.llm.llm_states import RecipesList, SearchRecipesList
+from consumer.llm.prompts import PROMPT_MODES, minified_schema
+from consumer.utils.html_extractors import extract_text
+
+CORPUS_PAGE = Path(__file__).parent / "corpus" / "borsch_article.html"
+
+
+def make_counter() -> tuple[str, Callable[[str], int]]:
+    try:
+        encoding = tiktoken.encoding_for_model("gpt-4o-mini")
+    except Exception:
+        return "симв.", len
+    return "ток.", lambda text: len(encoding.encode(text))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page", type=Path, default=CORPUS_PAGE, help="HTML-страница рецепта")
+    args = parser.parse_args()
+
+    content = extract_text(
+        args.page.read_text(encoding="utf-8"), setting.extract.extract_backend, setting.extract.extractor_options
+    ).text
+    unit, count = make_counter()
+
+    print(f"{'режим':<12} {'разбор, ' + unit:>14} {'из них схема':>13} {'поиск, ' + unit:>13} {'из них схема':>13}")
+    for mode in PROMPT_MODES:
+        setting.llm.llm_prompt_mode = mode
+        counts: list[int] = []
+        for agent, model, kwargs in (
+            (ParsingAgent(), RecipesList, {"content": content}),
+            (SearchAgent(), SearchRecipesList, {"content": content, "query": "борщ"}),
+        ):
+            schema = agent.prompt.partial_variables["format_instructions"]
+            prompt_tokens = count(agent.prompt.format(**kwargs))
+            if mode == "structured":
+                # схема уходит в описании функции, а не в тексте промпта
+                schema = json.dumps(minified_schema(model), ensure_ascii=False)
+                prompt_tokens += count(schema)
+            counts += [prompt_tokens, count(schema)]
+        print(f"{mode:<12} {counts[0]:>14} {counts[1]:>13} {counts[2]:>13} {counts[3]:>13}")
+
+
+if __name__ == "__main__":
+    main()
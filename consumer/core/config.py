@@ -1,7 +1,7 @@
 import logging
-import re
-import string
+import os
 from pathlib import Path
+from typing import Any, Literal
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
@@ -12,17 +12,20 @@ from openai import OpenAI
 from pydantic import BaseModel, SecretStr, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from consumer.core.patterns import HEADER_PATTERN, PUNCTUATION_PATTERN, WHITESPACE_PATTERN  # noqa: F401
+
 
 BASE_DIR = Path(__file__).parent.parent
 
 URL_PATTERN = r"https?://(?:[-\w.]|(?:%[\da-fA-F]{2}))+[/\w\.-]*\??[/\w\.-=&%]*"
-HEADER_PATTERN = re.compile(r"^(#+)\s(.+)")  # для заголовков документов в Markdown
-PUNCTUATION_PATTERN = re.compile(f"[{re.escape(string.punctuation)}]")  # для удаления пунктуации
-WHITESPACE_PATTERN = re.compile(r"\s+")  # для удаления лишних пробелов
 
 CHROMA_PATH = BASE_DIR / "recipe_chroma_db"
 COLLECTION_NAME = "recipe_data"
 
+CACHE_DIR = BASE_DIR / "cache"
+PAGE_CACHE_PATH = CACHE_DIR / "pages.sqlite3"
+LLM_CACHE_PATH = CACHE_DIR / "llm.sqlite3"
+
 
 def configure_logging(level: int = logging.INFO) -> None:
     logging.basicConfig(
@@ -36,6 +39,10 @@ class LlmSettings(BaseSettings):
     openrouter_api_key: SecretStr = Field(default=SecretStr(""), description="OpenRouter API key")
     base_url_llm: str = Field(default="", description="Base URL for LLM")
     model_llm: str = Field(default="", description="LLM model name")
+    llm_prompt_mode: Literal["full", "compact", "structured"] = Field(
+        default="full",
+        description="Response format in prompts: full JSON schema, compact sample or native structured output",
+    )
 
     model_config = SettingsConfigDict(
         env_file=BASE_DIR / ".env",
@@ -118,12 +125,267 @@ class RabitMQSettings(BaseSettings):
         return f"amqp://{self.rabbitmq_default_user}:{self.rabbitmq_default_pass}@{self.rabbitmq_default_host}:{self.rabbitmq_default_port}/"
 
 
+class FetchSettings(BaseSettings):
+    fetch_total_timeout: float = Field(default=30.0, description="Total timeout of page loading, sec")
+    fetch_connect_timeout: float = Field(default=10.0, description="Timeout of connection to host, sec")
+    fetch_read_timeout: float = Field(default=20.0, description="Timeout of reading the socket, sec")
+    fetch_pool_limit: int = Field(default=100, description="Max number of connections in the pool")
+    fetch_limit_per_host: int = Field(default=8, description="Max number of connections to one host")
+    fetch_dns_cache_ttl: int = Field(default=300, description="Lifetime of DNS cache records, sec")
+    fetch_keepalive_timeout: float = Field(default=30.0, description="Keep-alive timeout of idle connection, sec")
+    fetch_user_agent: str = Field(
+        default="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+        description="User-Agent header for page loading",
+    )
+    fetch_max_bytes: int = Field(default=2 * 1024 * 1024, description="Max size of loaded page, bytes")
+    fetch_chunk_size: int = Field(default=64 * 1024, description="Size of chunk for reading the page, bytes")
+    fetch_content_types: list[str] = Field(
+        default=["text/html", "application/xhtml+xml", "text/plain"],
+        description="Allowed Content-Type of loaded pages",
+    )
+    fetch_stop_markers: list[str] = Field(
+        default=[],
+        description="Tags after which the page is considered loaded, empty - read the whole page (JSON-LD may follow)",
+    )
+    page_cache_enabled: bool = Field(default=True, description="Cache loaded pages on disk")
+    page_cache_max_mb: int = Field(default=256, description="Max size of page cache on disk, MB")
+    fetch_global_concurrency: int = Field(default=32, description="Max number of simultaneous page loads")
+    fetch_host_concurrency: int = Field(default=2, description="Max number of simultaneous loads from one host")
+    fetch_host_rate: float = Field(default=1.0, description="Max rate of requests to one host, requests per sec")
+    fetch_host_burst: int = Field(default=3, description="Max number of requests to one host in a burst")
+    fetch_default_retry_after: float = Field(
+        default=10.0, description="Pause for host after 429/503 without Retry-After header, sec"
+    )
+    fetch_max_retry_after: float = Field(default=60.0, description="Max pause for host requested by Retry-After, sec")
+
+    model_config = SettingsConfigDict(
+        env_file=BASE_DIR / ".env",
+        env_file_encoding="utf-8",
+        extra="ignore",  # игнорирование наличия других полей в .env - файле
+        case_sensitive=False,  # регистронезависимость
+    )
+
+
+class ExtractSettings(BaseSettings):
+    extract_backend: Literal["lxml", "bs4"] = Field(default="lxml", description="HTML parsing backend: lxml or bs4")
+    extract_main_content: bool = Field(default=True, description="Keep only the main block of the page")
+    extract_min_main_chars: int = Field(
+        default=300, description="Min size of main block text, otherwise the whole page text is used"
+    )
+    extract_max_lines: int = Field(default=6000, description="Max number of text lines passed to LLM")
+
+    model_config = SettingsConfigDict(
+        env_file=BASE_DIR / ".env",
+        env_file_encoding="utf-8",
+        extra="ignore",  # игнорирование наличия других полей в .env - файле
+        case_sensitive=False,  # регистронезависимость
+    )
+
+    @property
+    def extractor_options(self) -> dict[str, Any]:
+        # параметры ReadabilityExtractor: передаются в задачи пула процессов, которые не читают настройки сами
+        return {
+            "main_content": self.extract_main_content,
+            "min_main_chars": self.extract_min_main_chars,
+            "max_lines": self.extract_max_lines,
+        }
+
+
+class CpuSettings(BaseSettings):
+    cpu_workers: int = Field(
+        default=max(1, (os.cpu_count() or 2) - 1),
+        description="Number of worker processes for CPU-bound steps, 0 - run them in threads",
+    )
+    cpu_queue_size: int = Field(default=32, description="Max number of tasks waiting for a free worker")
+    cpu_max_tasks_per_child: int = Field(
+        default=200, description="Number of tasks per worker after which the pool is recycled"
+    )
+
+    model_config = SettingsConfigDict(
+        env_file=BASE_DIR / ".env",
+        env_file_encoding="utf-8",
+        extra="ignore",  # игнорирование наличия других полей в .env - файле
+        case_sensitive=False,  # регистронезависимость
+    )
+
+
+class GatewaySettings(BaseSettings):
+    llm_concurrency_initial: int = Field(default=8, description="Initial limit of simultaneous LLM requests")
+    llm_concurrency_min: int = Field(default=1, description="Min limit of simultaneous LLM requests")
+    llm_concurrency_max: int = Field(default=32, description="Max limit of simultaneous LLM requests")
+    llm_retries: int = Field(default=3, description="Number of retries of LLM request on 429/5xx and connection errors")
+    llm_backoff_base: float = Field(default=1.0, description="Base delay of exponential backoff, sec")
+    llm_backoff_max: float = Field(default=30.0, description="Max delay of exponential backoff, sec")
+    llm_breaker_failures: int = Field(default=5, description="Number of failures in a row that opens the breaker")
+    llm_breaker_open_seconds: float = Field(default=30.0, description="Pause of LLM requests after breaker opens, sec")
+    llm_breaker_max_open_seconds: float = Field(default=300.0, description="Max pause of LLM requests, sec")
+    llm_breaker_max_wait: float = Field(
+        default=600.0, description="Max time a request waits for the provider to recover, sec"
+    )
+    llm_hedge_enabled: bool = Field(default=False, description="Duplicate slow LLM requests and take the first answer")
+    llm_hedge_percentile: float = Field(
+        default=0.95, description="Latency percentile of the primary provider after which the request is duplicated"
+    )
+    llm_hedge_min_samples: int = Field(default=20, description="Number of answers needed to use the percentile")
+    llm_hedge_initial_delay: float = Field(default=8.0, description="Hedge delay until enough answers, sec")
+    llm_hedge_min_delay: float = Field(default=1.0, description="Min hedge delay, sec")
+    llm_hedge_max_delay: float = Field(default=30.0, description="Max hedge delay, sec")
+    llm_secondary_base_url: str = Field(default="", description="Base URL of the secondary LLM provider for hedging")
+    llm_secondary_model: str = Field(default="", description="Model of the secondary provider, empty - same model")
+    llm_secondary_api_key: SecretStr = Field(
+        default=SecretStr(""), description="API key of the secondary provider, empty - primary key"
+    )
+
+    model_config = SettingsConfigDict(
+        env_file=BASE_DIR / ".env",
+        env_file_encoding="utf-8",
+        extra="ignore",  # игнорирование наличия других полей в .env - файле
+        case_sensitive=False,  # регистронезависимость
+    )
+
+
+class MetricsSettings(BaseSettings):
+    metrics_host: str = Field(default="0.0.0.0", description="Host of the Prometheus metrics endpoint")
+    metrics_port: int = Field(default=0, description="Port of the Prometheus metrics endpoint, 0 - disabled")
+
+    model_config = SettingsConfigDict(
+        env_file=BASE_DIR / ".env",
+        env_file_encoding="utf-8",
+        extra="ignore",  # игнорирование наличия других полей в .env - файле
+        case_sensitive=False,  # регистронезависимость
+    )
+
+
+class ParseSettings(BaseSettings):
+    parse_segment_chars: int = Field(default=4000, description="Max size of page segment parsed by one LLM call")
+    parse_max_segments: int = Field(default=12, description="Max number of segments parsed for one page")
+    parse_concurrency: int = Field(default=4, description="Max number of simultaneous LLM calls for one page")
+    parse_streaming: bool = Field(default=True, description="Stream LLM output and emit recipes as they are parsed")
+    url_inflight_ttl: int = Field(
+        default=15 * 60, description="Lifetime of the URL in-flight mark renewed on requeue, sec (same as in the bot)"
+    )
+
+    model_config = SettingsConfigDict(
+        env_file=BASE_DIR / ".env",
+        env_file_encoding="utf-8",
+        extra="ignore",  # игнорирование наличия других полей в .env - файле
+        case_sensitive=False,  # регистронезависимость
+    )
+
+
+class LlmCacheSettings(BaseSettings):
+    llm_cache_enabled: bool = Field(default=True, description="Cache LLM parsing results by page content hash")
+    llm_cache_max_mb: int = Field(default=64, description="Max size of LLM result cache on disk, MB")
+    llm_cache_ttl: int = Field(default=30 * 24 * 3600, description="Lifetime of LLM result cache records, sec")
+
+    model_config = SettingsConfigDict(
+        env_file=BASE_DIR / ".env",
+        env_file_encoding="utf-8",
+        extra="ignore",  # игнорирование наличия других полей в .env - файле
+        case_sensitive=False,  # регистронезависимость
+    )
+
+
+class SearchCacheSettings(BaseSettings):
+    search_cache_enabled: bool = Field(default=True, description="Reuse search answers for similar queries")
+    search_cache_threshold: float = Field(
+        default=0.85, description="Min cosine similarity of queries to reuse the cached answer"
+    )
+    search_cache_max_entries: int = Field(default=1000, description="Max number of cached search answers")
+    search_cache_ttl: int = Field(default=3600, description="Lifetime of cached search answers, sec")
+
+    model_config = SettingsConfigDict(
+        env_file=BASE_DIR / ".env",
+        env_file_encoding="utf-8",
+        extra="ignore",  # игнорирование наличия других полей в .env - файле
+        case_sensitive=False,  # регистронезависимость
+    )
+
+
+class SearchGateSettings(BaseSettings):
+    search_gate_enabled: bool = Field(default=True, description="Skip LLM rerank when vector search is unambiguous")
+    search_gate_accept_score: float = Field(
+        default=0.55, description="Min relevance score of the best hit to return it without LLM"
+    )
+    search_gate_min_gap: float = Field(
+        default=0.1, description="Min score gap between the best and the second recipe to return it without LLM"
+    )
+    search_gate_reject_score: float = Field(
+        default=0.1, description="Max relevance score of the best hit to answer 'nothing found' without LLM"
+    )
+
+    model_config = SettingsConfigDict(
+        env_file=BASE_DIR / ".env",
+        env_file_encoding="utf-8",
+        extra="ignore",  # игнорирование наличия других полей в .env - файле
+        case_sensitive=False,  # регистронезависимость
+    )
+
+
+class EmbeddingSettings(BaseSettings):
+    embedding_model: str = Field(
+        default="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2", description="Embedding model name"
+    )
+    embedding_backend: Literal["torch", "onnx_int8"] = Field(
+        default="torch", description="Embedding inference: PyTorch or ONNX Runtime with int8 dynamic quantization"
+    )
+    embedding_onnx_quantization: Literal["arm64", "avx2", "avx512", "avx512_vnni"] = Field(
+        default="avx2", description="Target instruction set of int8 quantization for the ONNX backend"
+    )
+    embedding_batch_size: int = Field(default=32, description="Number of texts encoded by the model at once")
+    embedding_cache_enabled: bool = Field(
+        default=True, description="Keep document embeddings on disk and encode only new chunk texts"
+    )
+    embedding_worker_enabled: bool = Field(
+        default=True, description="Encode concurrent embedding requests together in a dedicated worker thread"
+    )
+    embedding_worker_batch_size: int = Field(default=64, description="Max number of texts in one worker batch")
+    embedding_worker_max_wait_ms: float = Field(
+        default=5.0, description="Max time the worker waits for more requests before encoding a batch, ms"
+    )
+
+    model_config = SettingsConfigDict(
+        env_file=BASE_DIR / ".env",
+        env_file_encoding="utf-8",
+        extra="ignore",  # игнорирование наличия других полей в .env - файле
+        case_sensitive=False,  # регистронезависимость
+    )
+
+
+class RetrievalSettings(BaseSettings):
+    retrieval_mode: Literal["vector", "hybrid"] = Field(
+        default="hybrid", description="Recipe search: vector only or vector + BM25 fused by reciprocal rank fusion"
+    )
+    retrieval_candidates: int = Field(default=20, description="Number of candidates taken from each ranking")
+    retrieval_rrf_k: int = Field(default=60, description="Rank constant of reciprocal rank fusion")
+    bm25_k1: float = Field(default=1.5, description="BM25 term frequency saturation")
+    bm25_b: float = Field(default=0.75, description="BM25 document length normalization")
+
+    model_config = SettingsConfigDict(
+        env_file=BASE_DIR / ".env",
+        env_file_encoding="utf-8",
+        extra="ignore",  # игнорирование наличия других полей в .env - файле
+        case_sensitive=False,  # регистронезависимость
+    )
+
+
 class Setting(BaseModel):
     llm: LlmSettings = LlmSettings()
     bot: BotSettings = BotSettings()
     redis: RedisSettings = RedisSettings()
     mongo: MongoSettings = MongoSettings()
     rabbitmq: RabitMQSettings = RabitMQSettings()
+    fetch: FetchSettings = FetchSettings()
+    extract: ExtractSettings = ExtractSettings()
+    cpu: CpuSettings = CpuSettings()
+    parse: ParseSettings = ParseSettings()
+    gateway: GatewaySettings = GatewaySettings()
+    llm_cache: LlmCacheSettings = LlmCacheSettings()
+    search_cache: SearchCacheSettings = SearchCacheSettings()
+    search_gate: SearchGateSettings = SearchGateSettings()
+    embedding: EmbeddingSettings = EmbeddingSettings()
+    retrieval: RetrievalSettings = RetrievalSettings()
+    metrics: MetricsSettings = MetricsSettings()
     max_chunk_size: int = 512
     chunk_overlap: int = 50
 
@@ -0,0 +1,126 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Optional
+
+from consumer.core.config import configure_logging
+
+configure_logging(logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class DiskLRUCache:
+    """
+    Персистентный кэш «ключ → JSON-значение» в файле SQLite.
+    Значения хранятся сжатыми, при превышении max_bytes вытесняются
+    записи, к которым дольше всего не обращались (LRU).
+    """
+
+    def __init__(self, path: Path, max_bytes: int, ttl: Optional[float] = None) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits: int = 0
+        self.misses: int = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _open(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                accessed_at REAL NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)")
+
+    async def open(self):
+        if self._conn is not None:
+            return
+        await asyncio.to_thread(self._open)
+        logger.info(f"✅ Дисковый кэш открыт: {self.path}")
+
+    async def close(self):
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+                self._conn = None
+            logger.info(f"🔌 Дисковый кэш закрыт: {self.path} (hits={self.hits}, misses={self.misses})")
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            raise RuntimeError("Дисковый кэш не открыт. Вызовите open() перед использованием.")
+        return self._conn
+
+    def _get(self, key: str) -> Optional[dict[str, Any]]:
+        with self._lock:
+            row = self.conn.execute("SELECT value, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            value, created_at = row
+            now = time.time()
+            if self.ttl is not None and now - created_at > self.ttl:
+                self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+
+            self.conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(zlib.decompress(value))
+
+    def _set(self, key: str, value: dict[str, Any]) -> None:
+        blob = zlib.compress(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+        if len(blob) > self.max_bytes:
+            return
+
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, accessed_at, created_at) VALUES (?, ?, ?, ?, ?)",
+                (key, blob, len(blob), now, now),
+            )
+            self._evict()
+
+    def _evict(self) -> None:
+        (total,) = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if total <= self.max_bytes:
+            return
+
+        evicted = 0
+        for key, size in self.conn.execute("SELECT key, size FROM entries ORDER BY accessed_at").fetchall():
+            if total <= self.max_bytes:
+                break
+            self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        logger.info(f"Из кэша {self.path.name} вытеснено записей: {evicted}")
+
+    def _delete(self, key: str) -> None:
+        with self._lock:
+            self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    async def get(self, key: str) -> Optional[dict[str, Any]]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: dict[str, Any]) -> None:
+        await asyncio.to_thread(self._set, key, value)
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self._delete, key)
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
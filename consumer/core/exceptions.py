@@ -15,6 +15,10 @@ class ExceptTimeoutError(Exception):
     pass
 
 
+class ExceptContentTypeError(Exception):
+    pass
+
+
 class ExceptNormalizeTextError(Exception):
     pass
 
@@ -25,3 +29,11 @@ class ExceptAddChromaError(Exception):
 
 class ExceptProcessRecipeError(Exception):
     pass
+
+
+class ExceptLlmUnavailableError(Exception):
+    pass
+
+
+class ExceptEmbeddingCacheLockedError(Exception):
+    pass
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import multiprocessing
+import sys
+import types
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional, TypeVar
+
+from consumer.core.config import configure_logging, setting
+
+configure_logging(logging.INFO)
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# модули задач, импортируемые сервером воркеров один раз. Они (и всё, что они импортируют) не должны
+# загружать consumer.core.config: при импорте он создаёт клиентов Bot, Redis, RabbitMQ и OpenAI,
+# поэтому параметры из настроек передаются в задачи аргументами
+PRELOAD_MODULES = ["consumer.utils.html_extractors", "consumer.utils.structured_data", "consumer.utils.chunking"]
+
+
+@contextmanager
+def hidden_main_module() -> Iterator[None]:
+    """
+    Подмена главного модуля на пустой на время запуска воркеров: иначе multiprocessing импортирует
+    в каждом воркере главный модуль потребителя (consumer.main), а с ним и consumer.core.config.
+    """
+    main_module = sys.modules["__main__"]
+    sys.modules["__main__"] = types.ModuleType("__main__")
+    try:
+        yield
+    finally:
+        sys.modules["__main__"] = main_module
+
+
+class CpuExecutor:
+    """
+    Пул процессов для CPU-ёмких шагов обработки (разбор HTML, разбиение на чанки).
+    В отличие от asyncio.to_thread задачи не конкурируют за GIL с обработкой сообщений.
+
+    Число одновременно принятых задач ограничено (workers + queue_size), поэтому при
+    всплеске сообщений вызывающие ждут свободного места, а не копят очередь в памяти.
+    Чтобы воркеры не накапливали память, пул целиком заменяется новым примерно через
+    max_tasks_per_child задач на воркер (параметр max_tasks_per_child у ProcessPoolExecutor
+    в Python 3.11 может приводить к зависанию пула).
+    """
+
+    def __init__(self) -> None:
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._tasks_in_pool: int = 0
+
+    def _create_pool(self) -> ProcessPoolExecutor:
+        # forkserver: воркеры порождаются из чистого процесса с заранее импортированными модулями,
+        # а не копируют процесс потребителя с его потоками и соединениями
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(PRELOAD_MODULES)
+        self._tasks_in_pool = 0
+        return ProcessPoolExecutor(max_workers=setting.cpu.cpu_workers, mp_context=context)
+
+    def _recycle_if_needed(self) -> None:
+        self._tasks_in_pool += 1
+        if self._pool is None or self._tasks_in_pool < setting.cpu.cpu_workers * setting.cpu.cpu_max_tasks_per_child:
+            return
+        # уже отправленные задачи старый пул доработает в фоне
+        old_pool, self._pool = self._pool, self._create_pool()
+        old_pool.shutdown(wait=False)
+        logger.info("♻️ Пул процессов перезапущен")
+
+    async def start(self):
+        if self._pool is not None or setting.cpu.cpu_workers <= 0:
+            return
+        self._pool = self._create_pool()
+        self._slots = asyncio.Semaphore(setting.cpu.cpu_workers + setting.cpu.cpu_queue_size)
+        logger.info(f"✅ Пул процессов запущен, воркеров: {setting.cpu.cpu_workers}")
+
+    async def shutdown(self):
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            await asyncio.to_thread(pool.shutdown, wait=True, cancel_futures=True)
+            logger.info("🔌 Пул процессов остановлен")
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        """
+        Выполнение func(*args) в пуле процессов; func и аргументы должны сериализоваться pickle.
+        Если пул не запущен (например, при локальном запуске агента), задача выполняется в потоке.
+        """
+        if self._pool is None or self._slots is None:
+            return await asyncio.to_thread(func, *args)
+
+        async with self._slots:
+            self._recycle_if_needed()
+            pool = self._pool
+            try:
+                return await self._submit(pool, func, *args)
+            except BrokenProcessPool:
+                # воркер упал (например, по памяти): пересоздаём пул и повторяем задачу один раз
+                if self._pool is pool:
+                    logger.error("Пул процессов повреждён, перезапуск")
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    self._pool = self._create_pool()
+                return await self._submit(self._pool, func, *args)
+
+    @staticmethod
+    def _submit(pool: ProcessPoolExecutor, func: Callable[..., T], *args: Any) -> asyncio.Future[T]:
+        # ProcessPoolExecutor запускает воркеры при отправке задач, поэтому главный модуль скрывается здесь
+        with hidden_main_module():
+            return asyncio.wrap_future(pool.submit(func, *args))
+
+
+cpu_executor = CpuExecutor()
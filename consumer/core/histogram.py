@@ -0,0 +1,68 @@
+import bisect
+from typing import Sequence
+
+# границы корзин задержек, сек: от 50 мс до 2 минут
+LATENCY_BUCKETS: tuple[float, ...] = (
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    0.75,
+    1.0,
+    1.5,
+    2.0,
+    3.0,
+    4.0,
+    5.0,
+    7.5,
+    10.0,
+    15.0,
+    20.0,
+    30.0,
+    45.0,
+    60.0,
+    120.0,
+)
+
+
+class Histogram:
+    """
+    Гистограмма с фиксированными границами корзин (как histogram в Prometheus).
+    Память не растёт с числом наблюдений, квантиль оценивается линейной
+    интерполяцией внутри корзины.
+    """
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.buckets: tuple[float, ...] = tuple(buckets)
+        self.counts: list[int] = [0] * (len(self.buckets) + 1)  # последняя корзина: +Inf
+        self.count: int = 0
+        self.sum: float = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index == len(self.buckets):
+                    return lower
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+    def cumulative_counts(self) -> list[tuple[float, int]]:
+        """Накопленные счётчики по верхним границам корзин (последняя — +Inf)."""
+        result: list[tuple[float, int]] = []
+        total = 0
+        for bound, bucket_count in zip((*self.buckets, float("inf")), self.counts):
+            total += bucket_count
+            result.append((bound, total))
+        return result
@@ -0,0 +1,121 @@
+import codecs
+import logging
+import re
+from typing import Optional
+
+import aiohttp
+
+from consumer.core.config import configure_logging, setting
+from consumer.core.exceptions import ExceptContentTypeError
+
+configure_logging(logging.INFO)
+logger = logging.getLogger(__name__)
+
+META_CHARSET_PATTERN = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.IGNORECASE)
+
+
+class HttpClient:
+    """
+    Общий для процесса HTTP-клиент загрузки страниц.
+    Держит пул keep-alive соединений и кэш DNS, чтобы каждая загрузка
+    не платила заново за разрешение имени, TCP и TLS рукопожатия.
+    """
+
+    def __init__(self) -> None:
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def connect(self):
+        if self._session is not None and not self._session.closed:
+            return
+
+        connector = aiohttp.TCPConnector(
+            limit=setting.fetch.fetch_pool_limit,
+            limit_per_host=setting.fetch.fetch_limit_per_host,
+            ttl_dns_cache=setting.fetch.fetch_dns_cache_ttl,
+            keepalive_timeout=setting.fetch.fetch_keepalive_timeout,
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=setting.fetch.fetch_total_timeout,
+            connect=setting.fetch.fetch_connect_timeout,
+            sock_read=setting.fetch.fetch_read_timeout,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=timeout,
+            headers={"User-Agent": setting.fetch.fetch_user_agent},
+        )
+        logger.info("✅ HTTP-клиент загрузки страниц создан")
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+            logger.info("🔌 HTTP-клиент загрузки страниц закрыт")
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            raise RuntimeError("HTTP-клиент не создан. Вызовите connect() перед использованием.")
+        return self._session
+
+    @staticmethod
+    async def read_page(response: aiohttp.ClientResponse, url: str) -> tuple[str, bool]:
+        """
+        Потоковое чтение HTML-страницы с ограничением размера.
+        Тип содержимого проверяется до чтения тела; чтение прекращается при
+        достижении лимита байт или после маркера из fetch_stop_markers.
+        Возвращает текст страницы и признак того, что страница прочитана не целиком.
+        """
+        content_type = response.content_type.lower()
+        if response.headers.get("Content-Type") and content_type not in setting.fetch.fetch_content_types:
+            raise ExceptContentTypeError(f"Неподдерживаемый тип содержимого {content_type} у страницы {url}")
+
+        max_bytes = setting.fetch.fetch_max_bytes
+        if response.content_length is not None and response.content_length > max_bytes:
+            logger.info(f"Страница {url} больше лимита ({response.content_length} байт), будет прочитано начало")
+
+        markers = [marker.lower().encode() for marker in setting.fetch.fetch_stop_markers]
+        tail_size = max((len(marker) for marker in markers), default=0)
+        body = bytearray()
+        truncated = False
+
+        async for chunk in response.content.iter_chunked(setting.fetch.fetch_chunk_size):
+            # маркер может оказаться на границе чанков, поэтому ищем с захватом хвоста
+            window = bytes(body[-tail_size:] + chunk[: max_bytes - len(body)]).lower() if tail_size else b""
+            body.extend(chunk[: max_bytes - len(body)])
+
+            if len(body) >= max_bytes:
+                logger.info(f"Чтение страницы {url} остановлено на лимите {max_bytes} байт")
+                truncated = True
+                break
+            if any(marker in window for marker in markers):
+                logger.info(f"Чтение страницы {url} остановлено после маркера, прочитано {len(body)} байт")
+                truncated = True
+                break
+
+        return bytes(body).decode(HttpClient._detect_encoding(response, body), errors="replace"), truncated
+
+    @staticmethod
+    def _lookup_charset(charset: Optional[str]) -> Optional[str]:
+        if not charset:
+            return None
+        try:
+            return codecs.lookup(charset).name
+        except LookupError:
+            return None
+
+    @staticmethod
+    def _detect_encoding(response: aiohttp.ClientResponse, body: bytes) -> str:
+        # неизвестная кодировка в заголовке или в meta не должна ронять разбор страницы
+        charset = HttpClient._lookup_charset(response.charset)
+        if charset:
+            return charset
+        match = META_CHARSET_PATTERN.search(body[:4096])
+        if match:
+            charset = HttpClient._lookup_charset(match.group(1).decode("ascii", errors="replace"))
+            if charset:
+                return charset
+        return "utf-8"
+
+
+http_client = HttpClient()
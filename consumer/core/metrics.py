@@ -0,0 +1,152 @@
+import logging
+from typing import Optional, Sequence
+
+from aiohttp import web
+
+from consumer.core.config import configure_logging, setting
+from consumer.core.histogram import LATENCY_BUCKETS, Histogram
+
+configure_logging(logging.INFO)
+logger = logging.getLogger(__name__)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def _labels(labels: dict[str, object]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: Optional[tuple[str, str]] = None) -> str:
+    items = [*labels, extra] if extra else list(labels)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in items) + "}"
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else f"{bound:g}"
+
+
+class Counter:
+    """Счётчик с метками (например, число вызовов LLM по агентам и результатам)."""
+
+    def __init__(self, name: str, description: str) -> None:
+        self.name = name
+        self.description = description
+        self.values: dict[Labels, float] = {}
+
+    def inc(self, value: float = 1.0, **labels: object) -> None:
+        key = _labels(labels)
+        self.values[key] = self.values.get(key, 0.0) + value
+
+    def value(self, **labels: object) -> float:
+        return self.values.get(_labels(labels), 0.0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_format_labels(labels)} {value:g}" for labels, value in self.values.items()]
+        return lines
+
+    def summary(self) -> dict[str, float]:
+        return {",".join(value for _, value in labels) or "all": total for labels, total in self.values.items()}
+
+
+class LabeledHistogram:
+    """Набор гистограмм с общими границами корзин, по одной на каждое сочетание меток."""
+
+    def __init__(self, name: str, description: str, buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self.children: dict[Labels, Histogram] = {}
+
+    def observe(self, value: float, **labels: object) -> None:
+        key = _labels(labels)
+        if key not in self.children:
+            self.children[key] = Histogram(self.buckets)
+        self.children[key].observe(value)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        for labels, histogram in self.children.items():
+            for bound, count in histogram.cumulative_counts():
+                lines.append(f"{self.name}_bucket{_format_labels(labels, ('le', _format_bound(bound)))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {histogram.sum:g}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {histogram.count}")
+        return lines
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """Число наблюдений и квантили по каждому сочетанию меток — для вывода в лог."""
+        return {
+            ",".join(value for _, value in labels)
+            or "all": {
+                "count": histogram.count,
+                "p50": round(histogram.quantile(0.5), 3),
+                "p95": round(histogram.quantile(0.95), 3),
+                "p99": round(histogram.quantile(0.99), 3),
+            }
+            for labels, histogram in self.children.items()
+        }
+
+
+class MetricsRegistry:
+    """Реестр метрик потребителя; отдаётся в текстовом формате Prometheus."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Counter | LabeledHistogram] = {}
+
+    def counter(self, name: str, description: str) -> Counter:
+        if name not in self._metrics:
+            self._metrics[name] = Counter(name, description)
+        return self._metrics[name]
+
+    def histogram(self, name: str, description: str, buckets: Sequence[float] = LATENCY_BUCKETS) -> LabeledHistogram:
+        if name not in self._metrics:
+            self._metrics[name] = LabeledHistogram(name, description, buckets)
+        return self._metrics[name]
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics.values():
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> dict[str, dict]:
+        return {name: metric.summary() for name, metric in self._metrics.items()}
+
+
+class MetricsServer:
+    """HTTP-сервер для сбора метрик Prometheus (GET /metrics); запускается, если задан metrics_port."""
+
+    def __init__(self, registry: MetricsRegistry) -> None:
+        self.registry = registry
+        self._runner: Optional[web.AppRunner] = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.registry.render(), content_type="text/plain", charset="utf-8")
+
+    async def start(self) -> None:
+        if not setting.metrics.metrics_port or self._runner is not None:
+            return
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, setting.metrics.metrics_host, setting.metrics.metrics_port).start()
+        logger.info(
+            f"📈 Метрики доступны на http://{setting.metrics.metrics_host}:{setting.metrics.metrics_port}/metrics"
+        )
+
+    async def close(self) -> None:
+        logger.info(f"📈 Метрики: {self.registry.summary()}")
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+metrics = MetricsRegistry()
+metrics_server = MetricsServer(metrics)
@@ -0,0 +1,11 @@
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+class CachedPage(BaseModel):
+    body: str = Field(..., description="HTML страницы")
+    etag: Optional[str] = Field(default=None, description="заголовок ETag ответа")
+    last_modified: Optional[str] = Field(default=None, description="заголовок Last-Modified ответа")
+    content: Optional[str] = Field(default=None, description="извлечённый из страницы текст")
+    truncated: bool = Field(default=False, description="страница прочитана не целиком (лимит размера, маркер)")
@@ -0,0 +1,76 @@
+import logging
+from typing import Optional
+
+from consumer.core.config import PAGE_CACHE_PATH, configure_logging, setting
+from consumer.core.disk_cache import DiskLRUCache
+from consumer.core.page import CachedPage
+from consumer.utils.url import canonicalize_url
+
+configure_logging(logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class PageCache:
+    """
+    Кэш загруженных страниц по каноническому URL.
+    Повторная загрузка идёт с If-None-Match/If-Modified-Since: ответ 304
+    означает, что можно взять из кэша и HTML, и уже извлечённый текст.
+    """
+
+    def __init__(self) -> None:
+        self.enabled: bool = setting.fetch.page_cache_enabled
+        self._cache = DiskLRUCache(PAGE_CACHE_PATH, max_bytes=setting.fetch.page_cache_max_mb * 1024 * 1024)
+        self.hits: int = 0  # страница не изменилась (304)
+        self.misses: int = 0  # страница загружена целиком
+
+    async def open(self):
+        if self.enabled:
+            await self._cache.open()
+
+    async def close(self):
+        if self.enabled:
+            logger.info(f"📊 Статистика кэша страниц: {self.stats()}")
+            await self._cache.close()
+
+    async def get(self, url: str) -> Optional[CachedPage]:
+        if not self.enabled:
+            return None
+        value = await self._cache.get(canonicalize_url(url))
+        return CachedPage(**value) if value is not None else None
+
+    async def put(self, url: str, page: CachedPage) -> None:
+        if not self.enabled or (page.etag is None and page.last_modified is None):
+            # без валидаторов страницу нельзя перепроверить условным запросом
+            return
+        if page.truncated:
+            # по ответу 304 обрезанная страница отдавалась бы из кэша без разметки из конца документа
+            return
+        await self._cache.set(canonicalize_url(url), page.model_dump())
+
+    @staticmethod
+    def conditional_headers(page: Optional[CachedPage]) -> dict[str, str]:
+        headers: dict[str, str] = {}
+        if page is None:
+            return headers
+        if page.etag:
+            headers["If-None-Match"] = page.etag
+        if page.last_modified:
+            headers["If-Modified-Since"] = page.last_modified
+        return headers
+
+    def record_hit(self) -> None:
+        self.hits += 1
+
+    def record_miss(self) -> None:
+        self.misses += 1
+
+    def stats(self) -> dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+page_cache = PageCache()
@@ -0,0 +1,8 @@
+import re
+import string
+
+# модуль без зависимостей: его импортируют и задачи пула процессов, которым нельзя загружать consumer.core.config
+
+HEADER_PATTERN = re.compile(r"^(#+)\s(.+)")  # для заголовков документов в Markdown
+PUNCTUATION_PATTERN = re.compile(f"[{re.escape(string.punctuation)}]")  # для удаления пунктуации
+WHITESPACE_PATTERN = re.compile(r"\s+")  # для удаления лишних пробелов
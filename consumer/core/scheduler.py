@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Optional
+from urllib.parse import urlsplit
+
+from consumer.core.config import configure_logging, setting
+
+configure_logging(logging.INFO)
+logger = logging.getLogger(__name__)
+
+MAX_TRACKED_HOSTS = 1024
+
+
+class TokenBucket:
+    """Ограничение частоты запросов: rate токенов в секунду, не больше burst подряд."""
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._tokens: float = burst
+        self._updated: float = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class HostState:
+    def __init__(self) -> None:
+        self.semaphore = asyncio.Semaphore(setting.fetch.fetch_host_concurrency)
+        self.bucket = TokenBucket(setting.fetch.fetch_host_rate, setting.fetch.fetch_host_burst)
+        self.blocked_until: float = 0.0
+        self.active: int = 0
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Значение заголовка Retry-After в секундах (число секунд или HTTP-дата)."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class DomainScheduler:
+    """
+    Планировщик загрузки страниц с учётом домена.
+    Для каждого хоста ограничены число одновременных запросов и их частота (token bucket),
+    после ответа 429/503 хост «замораживается» на время из Retry-After. Общий лимит
+    одновременных загрузок не даёт всплеску ссылок занять все соединения.
+    """
+
+    def __init__(self) -> None:
+        self._hosts: dict[str, HostState] = {}
+        self._global: Optional[asyncio.Semaphore] = None
+
+    @staticmethod
+    def host(url: str) -> str:
+        return (urlsplit(url).hostname or "").lower()
+
+    def _state(self, host: str) -> HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            if len(self._hosts) >= MAX_TRACKED_HOSTS:
+                self._prune()
+            state = self._hosts[host] = HostState()
+        return state
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        for host in [h for h, s in self._hosts.items() if s.active == 0 and s.blocked_until <= now]:
+            del self._hosts[host]
+
+    @asynccontextmanager
+    async def slot(self, url: str) -> AsyncIterator[None]:
+        """Ожидание права на запрос к хосту URL с соблюдением всех лимитов."""
+        if self._global is None:
+            self._global = asyncio.Semaphore(setting.fetch.fetch_global_concurrency)
+
+        host = self.host(url)
+        state = self._state(host)
+        state.active += 1
+        try:
+            async with state.semaphore:
+                # глобальный слот занимаем последним, чтобы ожидание одного хоста не тормозило остальные
+                delay = state.blocked_until - time.monotonic()
+                if delay > 0:
+                    logger.info(f"Хост {host} просил подождать, пауза {delay:.1f} сек")
+                    await asyncio.sleep(delay)
+                await state.bucket.acquire()
+                async with self._global:
+                    yield
+        finally:
+            state.active -= 1
+
+    def retry_after(self, url: str, seconds: Optional[float]) -> float:
+        """Запоминание паузы для хоста после 429/503; возвращает назначенную паузу."""
+        delay = seconds if seconds is not None else setting.fetch.fetch_default_retry_after
+        delay = min(delay, setting.fetch.fetch_max_retry_after)
+        state = self._state(self.host(url))
+        state.blocked_until = max(state.blocked_until, time.monotonic() + delay)
+        logger.warning(f"Хост {self.host(url)} ограничил запросы, пауза {delay:.1f} сек")
+        return delay
+
+
+fetch_scheduler = DomainScheduler()
@@ -1,44 +1,116 @@
 import asyncio
 import logging
+from typing import AsyncIterator, Callable, Optional
 
 import aiohttp
-from bs4 import BeautifulSoup
 from langchain.prompts import PromptTemplate
-from langchain.schema import HumanMessage, SystemMessage
+from langchain.schema import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.exceptions import OutputParserException
 from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.runnables import Runnable
 from langchain_openai import ChatOpenAI
+from langgraph.config import get_stream_writer
 from langgraph.graph import END, START, StateGraph
 from langgraph.graph.state import CompiledStateGraph
+from pydantic import BaseModel
 
 from consumer.core.config import configure_logging, setting
 from consumer.core.exceptions import (
     ExceptClientError,
     ExceptClientResponseError,
+    ExceptContentTypeError,
     ExceptTimeoutError,
 )
+from consumer.core.executor import cpu_executor
+from consumer.core.http_client import http_client
+from consumer.core.page import CachedPage
+from consumer.core.page_cache import page_cache
+from consumer.core.scheduler import fetch_scheduler, parse_retry_after
+from consumer.llm.gateway import llm_gateway
+from consumer.llm.llm_cache import llm_cache
 from consumer.llm.llm_states import ParsingState, RecipesList, SearchRecipesList
+from consumer.llm.prompts import compact_format_instructions, minified_schema
+from consumer.llm.usage import LlmCall, record_cache_hit, token_usage, track_llm_call
+from consumer.utils.html_extractors import extract_text
+from consumer.utils.json_stream import JsonArrayStreamParser
+from consumer.utils.segmentation import merge_recipes, split_into_segments
+from consumer.utils.structured_data import extract_structured_recipes
 
 configure_logging(logging.INFO)
 logger = logging.getLogger(__name__)
 
+# увеличивается при любом изменении промпта разбора страницы, чтобы не брать из кэша устаревшие ответы
+PARSING_PROMPT_VERSION = "1"
+
+
+def create_llm(
+    model_name: str, temperature: float, base_url: str = "https://api.aitunnel.ru/v1/", api_key: str = ""
+) -> ChatOpenAI:
+    return ChatOpenAI(
+        model=model_name,
+        api_key=api_key or setting.llm.openrouter_api_key.get_secret_value(),
+        base_url=base_url,
+        temperature=temperature,
+        stream_usage=True,  # число токенов приходит и в потоковом режиме
+        max_retries=0,  # повторы выполняет llm_gateway
+    )
+
+
+def create_hedge_llm(llm: ChatOpenAI, temperature: float) -> ChatOpenAI:
+    """Клиент для дублирующих запросов: резервный провайдер, если он настроен, иначе основной"""
+    config = setting.gateway
+    if not config.llm_secondary_base_url:
+        return llm
+    return create_llm(
+        config.llm_secondary_model or llm.model_name,
+        temperature,
+        base_url=config.llm_secondary_base_url,
+        api_key=config.llm_secondary_api_key.get_secret_value(),
+    )
+
+
+def format_instructions(parser: JsonOutputParser, model: type[BaseModel]) -> str:
+    """Описание формата ответа для промпта в зависимости от режима llm_prompt_mode"""
+    mode = setting.llm.llm_prompt_mode
+    if mode == "compact":
+        return compact_format_instructions(model)
+    if mode == "structured":
+        # схема передаётся моделью через function calling, в тексте промпта она не нужна
+        return ""
+    return parser.get_format_instructions()
+
+
+def create_structured_llm(llm: ChatOpenAI, model: type[BaseModel]) -> Optional[Runnable]:
+    if setting.llm.llm_prompt_mode != "structured":
+        return None
+    return llm.with_structured_output(minified_schema(model), method="function_calling", include_raw=True)
+
+
+async def ainvoke_structured(
+    structured_llm: Runnable, hedge_llm: Runnable, messages: list[BaseMessage], call: LlmCall
+) -> dict[str, any]:
+    """Вызов модели в режиме structured output; ошибка разбора ответа поднимает OutputParserException"""
+    result = await llm_gateway.call(
+        call.agent, lambda: structured_llm.ainvoke(messages), hedge=lambda: hedge_llm.ainvoke(messages)
+    )
+    call.usage = result["raw"].usage_metadata
+    if result["parsing_error"] is not None or result["parsed"] is None:
+        raise OutputParserException(f"Некорректный ответ модели: {result['parsing_error']}")
+    return result["parsed"]
+
 
 class SearchAgent:
     def __init__(self, model_name: str = "gpt-4o-mini", temperature: float = 0.1):
         """Инициализация агента"""
-        self.llm = ChatOpenAI(
-            model=model_name,
-            api_key=setting.llm.openrouter_api_key.get_secret_value(),
-            base_url="https://api.aitunnel.ru/v1/",
-            temperature=temperature,
-        )
-
-    async def search_recepts(self, query: str, content: str) -> SearchRecipesList:
-        # создаём парсер для списка рецептов
-        parser = JsonOutputParser(pydantic_object=SearchRecipesList)
-        logger.info(f"Start search recepts with {query=}")
-        prompt = PromptTemplate(
+        self.llm = create_llm(model_name, temperature)
+        self.hedge_llm = create_hedge_llm(self.llm, temperature)
+        self.structured_llm = create_structured_llm(self.llm, SearchRecipesList)
+        self.structured_hedge_llm = create_structured_llm(self.hedge_llm, SearchRecipesList)
+        # парсер и шаблон промпта не зависят от запроса и создаются один раз
+        self.parser = JsonOutputParser(pydantic_object=SearchRecipesList)
+        self.prompt = PromptTemplate(
             input_variables=["query", "content"],
-            partial_variables={"format_instructions": parser.get_format_instructions()},
+            partial_variables={"format_instructions": format_instructions(self.parser, SearchRecipesList)},
             template="""
                 Ты кулинарный блогер, анализирующий текст рецептов.
                 Найди рецепты соответствующик запросу верни их в JSON формате как список.
@@ -53,59 +125,128 @@ class SearchAgent:
                 """,
         )
 
+    async def search_recepts(self, query: str, content: str) -> SearchRecipesList:
+        logger.info(f"Start search recepts with {query=}")
+
         messages = [
             SystemMessage(content="Ты эксперт по кулинарии."),
-            HumanMessage(content=prompt.format(content=content, query=query)),
+            HumanMessage(content=self.prompt.format(content=content, query=query)),
         ]
 
-        response = await self.llm.ainvoke(messages)
-
         try:
-            # parser возвращает словарь, содержащий список рецептов
-            res_json = parser.parse(response.content)
-        except Exception as e:
+            with track_llm_call("search", self.llm.model_name, setting.llm.llm_prompt_mode) as call:
+                if self.structured_llm is not None:
+                    res_json = await ainvoke_structured(self.structured_llm, self.structured_hedge_llm, messages, call)
+                else:
+                    response = await llm_gateway.call(
+                        "search", lambda: self.llm.ainvoke(messages), hedge=lambda: self.hedge_llm.ainvoke(messages)
+                    )
+                    call.usage = response.usage_metadata
+                    # parser возвращает словарь, содержащий список рецептов
+                    res_json = self.parser.parse(response.content)
+        except OutputParserException as e:
             print(f"Ошибка при разборе JSON: {e}")
             return {"status": f"Ошибка парсинга: {e}"}
 
         return {"recipes": res_json["recipes"]}
 
+    async def aclose(self):
+        """Закрытие пулов HTTP-соединений клиентов LLM"""
+        await self.llm.root_async_client.close()
+        if self.hedge_llm is not self.llm:
+            await self.hedge_llm.root_async_client.close()
+
 
 class ParsingAgent:
     def __init__(self, model_name: str = "gpt-4o-mini", temperature: float = 0.1):
         """Инициализация агента"""
-        self.llm = ChatOpenAI(
-            model=model_name,
-            api_key=setting.llm.openrouter_api_key.get_secret_value(),
-            base_url="https://api.aitunnel.ru/v1/",
-            temperature=temperature,
+        self.llm = create_llm(model_name, temperature)
+        self.hedge_llm = create_hedge_llm(self.llm, temperature)
+        self.structured_llm = create_structured_llm(self.llm, RecipesList)
+        self.structured_hedge_llm = create_structured_llm(self.hedge_llm, RecipesList)
+        # ответы в разных режимах промпта кэшируются раздельно
+        self.prompt_version = f"{PARSING_PROMPT_VERSION}-{setting.llm.llm_prompt_mode}"
+        # парсер и шаблон промпта создаются один раз на всё время жизни агента
+        self.parser = JsonOutputParser(pydantic_object=RecipesList)
+        self.prompt = PromptTemplate(
+            input_variables=["content"],
+            partial_variables={"format_instructions": format_instructions(self.parser, RecipesList)},
+            template="""
+                Ты кулинарный блогер, анализирующий текст рецептов.
+                Найди все рецепты на странице и верни их в JSON формате как список.
+                Каждый рецепт должен содержать поля: title, ingredients, description, category.
+            
+                {content}
+            
+                {format_instructions}
+            
+                Только JSON!
+                """,
         )
+
         self.workflow = self._create_workflow()
 
     def _create_workflow(self) -> CompiledStateGraph:
         workflow = StateGraph(ParsingState)
 
+        workflow.add_node("fetch_page", self._fetch_page_node)
+        workflow.add_node("structured_data", self._structured_data_node)
         workflow.add_node("parsing_site", self._parsing_site_ai_node)
 
-        workflow.add_edge(START, "parsing_site")
+        workflow.add_edge(START, "fetch_page")
+        workflow.add_conditional_edges("fetch_page", self._route_after_fetch, ["structured_data", END])
+        workflow.add_conditional_edges("structured_data", self._route_after_structured_data, ["parsing_site", END])
         workflow.add_edge("parsing_site", END)
 
         return workflow.compile()
 
-    async def _fetch_webpage(self, state: ParsingState, timeout=30, retries=2) -> str:
-        """Асинхронная загрузка веб-страницы"""
+    @staticmethod
+    def _route_after_fetch(state: ParsingState) -> str:
+        return "structured_data" if state["status"] == "Ok" else END
+
+    @staticmethod
+    def _route_after_structured_data(state: ParsingState) -> str:
+        # рецепты из разметки schema.org найдены, LLM не нужна
+        return END if state["recipes"] else "parsing_site"
+
+    async def _fetch_webpage(
+        self, state: ParsingState, cached: Optional[CachedPage] = None, retries=2
+    ) -> tuple[CachedPage, bool]:
+        """
+        Асинхронная загрузка веб-страницы через общий пул соединений.
+        Если страница есть в кэше, запрос делается условным; второй элемент
+        результата равен True, когда сервер ответил 304 и страница взята из кэша.
+        """
 
         url: str = state["url"]
         logger.info(f"Start fetch webpage {url}")
-        default_headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
+        headers = page_cache.conditional_headers(cached)
 
-        timeout_obj = aiohttp.ClientTimeout(total=timeout)
         for attempt in range(retries + 1):
             try:
-                async with aiohttp.ClientSession(timeout=timeout_obj, headers=default_headers) as session:
-                    async with session.get(url) as response:
-                        response.raise_for_status()
-
-                        return await response.text()
+                async with fetch_scheduler.slot(url), http_client.session.get(url, headers=headers) as response:
+                    if response.status == 304 and cached is not None:
+                        logger.info(f"Страница {url} не изменилась, используется кэш")
+                        page_cache.record_hit()
+                        return cached, True
+
+                    if response.status in (429, 503):
+                        # следующая попытка сама дождётся окончания паузы в планировщике
+                        delay = fetch_scheduler.retry_after(url, parse_retry_after(response.headers.get("Retry-After")))
+                        if attempt < retries and delay < setting.fetch.fetch_max_retry_after:
+                            continue
+
+                    response.raise_for_status()
+                    page_cache.record_miss()
+
+                    body, truncated = await http_client.read_page(response, url)
+                    page = CachedPage(
+                        body=body,
+                        truncated=truncated,
+                        etag=response.headers.get("ETag"),
+                        last_modified=response.headers.get("Last-Modified"),
+                    )
+                    return page, False
 
             except aiohttp.ClientResponseError as e:
                 logger.warning(f"Ошибка ClientResponseError при загрузке страницы {url}")
@@ -128,20 +269,20 @@ class ParsingAgent:
     async def _extract_text_content(self, html_content: str):
         """Извлечение текстового контента со скаченной страницы Интернет"""
 
-        def sync_parse():
-            soup = BeautifulSoup(html_content, "html.parser")
-            for element in soup(["script", "style", "nav", "footer", "header"]):
-                element.decompose()
-            text = soup.get_text(separator="\n", strip=True)
-            lines = [line.strip() for line in text.split("\n") if line.strip()]
-            return "\n".join(lines[:2000])
-
-        logger.info("Start extract text from content")
-        return await asyncio.to_thread(sync_parse)
+        logger.info(f"Start extract text from content ({setting.extract.extract_backend})")
+        extracted = await cpu_executor.run(
+            extract_text, html_content, setting.extract.extract_backend, setting.extract.extractor_options
+        )
+        logger.info(
+            f"Извлечён текст страницы: {extracted.page_chars} -> {len(extracted.text)} символов "
+            f"({100 * len(extracted.text) / extracted.page_chars if extracted.page_chars else 0:.0f}%)"
+        )
+        return extracted.text
 
-    async def _parsing_site_ai_node(self, state: ParsingState) -> dict[str, any]:
+    async def _fetch_page_node(self, state: ParsingState) -> dict[str, any]:
+        cached = await page_cache.get(state["url"])
         try:
-            html_content = await self._fetch_webpage(state=state)
+            page, not_modified = await self._fetch_webpage(state=state, cached=cached)
         except ExceptClientResponseError as e:
             if e.status == 404:
                 return {"status": "Страница не найдена"}
@@ -153,53 +294,135 @@ class ParsingAgent:
             return {"status": "Ошибка сервиса"}
         except ExceptTimeoutError:
             return {"status": "Таймаут при загрузке страницы"}
+        except ExceptContentTypeError:
+            return {"status": "Ссылка не ведёт на HTML-страницу"}
 
-        content = await self._extract_text_content(html_content=html_content)
+        return {"page": page, "page_from_cache": not_modified}
 
-        # создаём парсер для списка рецептов
-        parser = JsonOutputParser(pydantic_object=RecipesList)
+    async def _structured_data_node(self, state: ParsingState) -> dict[str, any]:
+        """Извлечение рецептов из разметки schema.org (JSON-LD, Microdata) без обращения к LLM"""
+        page: CachedPage = state["page"]
+        recipes = await cpu_executor.run(extract_structured_recipes, page.body)
+        if not recipes:
+            logger.info("Структурированные данные рецептов не найдены, разбор через LLM")
+            return {}
 
-        prompt = PromptTemplate(
-            input_variables=["content"],
-            partial_variables={"format_instructions": parser.get_format_instructions()},
-            template="""
-                Ты кулинарный блогер, анализирующий текст рецептов.
-                Найди все рецепты на странице и верни их в JSON формате как список.
-                Каждый рецепт должен содержать поля: title, ingredients, description, category.
-            
-                {content}
-            
-                {format_instructions}
-            
-                Только JSON!
-                """,
-        )
+        logger.info(f"Из разметки schema.org извлечено рецептов: {len(recipes)}")
+        if not state["page_from_cache"]:
+            await page_cache.put(state["url"], page)
+        return {"status": "Ok", "recipes": recipes}
+
+    async def _parsing_site_ai_node(self, state: ParsingState) -> dict[str, any]:
+        page: CachedPage = state["page"]
+        if state["page_from_cache"] and page.content:
+            content = page.content
+        else:
+            content = await self._extract_text_content(html_content=page.body)
+            page.content = content
+            await page_cache.put(state["url"], page)
+
+        segments = split_into_segments(content, setting.parse.parse_segment_chars)
+        if len(segments) > setting.parse.parse_max_segments:
+            logger.warning(
+                f"Страница {state['url']} разбита на {len(segments)} сегментов, "
+                f"разбираются первые {setting.parse.parse_max_segments}"
+            )
+            segments = segments[: setting.parse.parse_max_segments]
+        if len(segments) > 1:
+            logger.info(f"Длинная страница разбита на сегменты: {len(segments)}")
+
+        # сегменты разбираются параллельно, общее время определяется самым долгим из них
+        slots = asyncio.Semaphore(setting.parse.parse_concurrency)
+        writer = get_stream_writer()
+        # рецепт на стыке сегментов приходит из каждого сегмента частями и собирается только в merge_recipes,
+        # поэтому рецепты выдаются потоком лишь для страницы из одного сегмента
+        on_recipe = (lambda recipe: writer({"recipe": recipe})) if len(segments) == 1 else None
+
+        async def parse_with_limit(segment: str) -> list[dict[str, any]]:
+            async with slots:
+                return await self._parse_segment(segment, on_recipe=on_recipe)
+
+        results = await asyncio.gather(*(parse_with_limit(segment) for segment in segments), return_exceptions=True)
+
+        for result in results:
+            # ошибки обращения к LLM пробрасываются как раньше, ошибки разбора JSON учитываются по сегментам
+            if isinstance(result, Exception) and not isinstance(result, OutputParserException):
+                raise result
+        errors = [result for result in results if isinstance(result, Exception)]
+        parsed = [result for result in results if not isinstance(result, Exception)]
+        if not parsed:
+            print(f"Ошибка при разборе JSON: {errors[0]}")
+            return {"status": f"Ошибка парсинга: {errors[0]}"}
+        if errors:
+            logger.warning(f"Не удалось разобрать сегментов: {len(errors)} из {len(segments)}")
+
+        return {"status": "Ok", "recipes": merge_recipes(parsed)}
+
+    async def _parse_segment(
+        self, content: str, on_recipe: Optional[Callable[[dict[str, any]], None]] = None
+    ) -> list[dict[str, any]]:
+        """
+        Извлечение рецептов из одного сегмента текста через LLM (с кэшем по содержимому).
+        В потоковом режиме каждый рецепт передаётся в on_recipe сразу, как только модель его допишет.
+        """
+        cache_key = llm_cache.make_key(content, self.llm.model_name, self.prompt_version)
+        cached = await llm_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Результат разбора сегмента взят из кэша LLM")
+            record_cache_hit("parsing", self.llm.model_name)
+            return cached["recipes"]
 
         messages = [
             SystemMessage(content="Ты эксперт по кулинарии."),
-            HumanMessage(content=prompt.format(content=content)),
+            HumanMessage(content=self.prompt.format(content=content)),
         ]
 
-        response = await self.llm.ainvoke(messages)
-
-        try:
-            # parser возвращает словарь, содержащий список рецептов
-            res_json = parser.parse(response.content)
-        except Exception as e:
-            print(f"Ошибка при разборе JSON: {e}")
-            return {"status": f"Ошибка парсинга: {e}"}
-
-        return {"status": "Ok", "recipes": res_json["recipes"]}
-
-    async def classify(self, url: str):
-        """Основной метод для классификации рецептов с веб-страницы"""
-        initial_state = {
+        with track_llm_call("parsing", self.llm.model_name, setting.llm.llm_prompt_mode) as call:
+            if self.structured_llm is not None:
+                # в режиме structured output ответ приходит целиком, без потоковой выдачи рецептов
+                res_json = await ainvoke_structured(self.structured_llm, self.structured_hedge_llm, messages, call)
+            else:
+                if setting.parse.parse_streaming and on_recipe is not None:
+                    stream_parser = JsonArrayStreamParser("recipes")
+                    async for chunk in llm_gateway.stream("parsing", lambda: self.llm.astream(messages)):
+                        if chunk.content:
+                            call.first_token()
+                        call.usage = chunk.usage_metadata or call.usage
+                        for recipe in stream_parser.feed(chunk.content):
+                            on_recipe(recipe)
+                    content = stream_parser.text
+                else:
+                    response = await llm_gateway.call(
+                        "parsing", lambda: self.llm.ainvoke(messages), hedge=lambda: self.hedge_llm.ainvoke(messages)
+                    )
+                    call.usage = response.usage_metadata
+                    content = response.content
+
+                # parser возвращает словарь, содержащий список рецептов; ошибка разбора обрабатывается в узле графа
+                res_json = self.parser.parse(content)
+
+        await llm_cache.set(cache_key, {"recipes": res_json["recipes"]})
+        return res_json["recipes"]
+
+    async def aclose(self):
+        """Закрытие пулов HTTP-соединений клиентов LLM"""
+        await self.llm.root_async_client.close()
+        if self.hedge_llm is not self.llm:
+            await self.hedge_llm.root_async_client.close()
+
+    @staticmethod
+    def _initial_state(url: str) -> ParsingState:
+        return {
             "url": url,
             "status": "Ok",
             "recipes": [],  # список рецептов, заполняется в ходе работы пайплайна
+            "page": None,
+            "page_from_cache": False,
         }
 
-        result = await self.workflow.ainvoke(initial_state)
+    async def classify(self, url: str):
+        """Основной метод для классификации рецептов с веб-страницы"""
+        result = await self.workflow.ainvoke(self._initial_state(url))
 
         state_result = {
             "status": result["status"],
@@ -209,8 +432,73 @@ class ParsingAgent:
 
         return state_result
 
+    async def classify_stream(self, url: str) -> AsyncIterator[tuple[str, dict[str, any]]]:
+        """
+        Классификация с выдачей рецептов по мере их разбора моделью.
+        Выдаёт пары ("recipe", рецепт) для каждого дописанного рецепта и в конце
+        ("result", итог) в том же формате, что и classify(). В итоге могут быть рецепты,
+        не выданные по отдельности (из разметки schema.org, из кэша, после объединения сегментов).
+        """
+        result: dict[str, any] = {}
+        async for mode, chunk in self.workflow.astream(self._initial_state(url), stream_mode=["custom", "values"]):
+            if mode == "custom" and "recipe" in chunk:
+                yield "recipe", chunk["recipe"]
+            elif mode == "values":
+                result = chunk
+
+        yield "result", {
+            "status": result.get("status", "Ok"),
+            "url": url,
+            "recipes": result.get("recipes", []),
+        }
+
+
+class AgentRegistry:
+    """
+    Долгоживущие агенты потребителя.
+    Создаются один раз при старте приложения: клиент LLM с его пулом соединений,
+    шаблоны промптов и граф LangGraph переиспользуются всеми сообщениями.
+    """
+
+    def __init__(self) -> None:
+        self._parsing: Optional[ParsingAgent] = None
+        self._search: Optional[SearchAgent] = None
+
+    async def init(self):
+        if self._parsing is None:
+            self._parsing = ParsingAgent()
+            self._search = SearchAgent()
+            logger.info("✅ Агенты LLM созданы")
+
+    async def close(self):
+        if self._parsing is not None:
+            await self._parsing.aclose()
+            await self._search.aclose()
+            self._parsing = self._search = None
+            logger.info(f"📊 Расход токенов LLM: {token_usage.stats()}")
+            logger.info(f"📊 Задержки LLM: {llm_gateway.stats()}")
+            logger.info("🔌 Агенты LLM остановлены")
+
+    @property
+    def parsing(self) -> ParsingAgent:
+        if self._parsing is None:
+            raise RuntimeError("Агенты не созданы. Вызовите init() перед использованием.")
+        return self._parsing
+
+    @property
+    def search(self) -> SearchAgent:
+        if self._search is None:
+            raise RuntimeError("Агенты не созданы. Вызовите init() перед использованием.")
+        return self._search
+
+
+agent_registry = AgentRegistry()
+
 
 async def main():
+    await http_client.connect()
+    await page_cache.open()
+    await llm_cache.open()
     app = ParsingAgent()
     res = await app.classify(
         "https://share.google/mhpd7DAqaCSwPcnV8"
@@ -258,6 +546,10 @@ async def main():
     else:
         print(f"Ошибка: {res['status']}")
 
+    await page_cache.close()
+    await llm_cache.close()
+    await http_client.close()
+
 
 if __name__ == "__main__":
 
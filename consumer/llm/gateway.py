@@ -0,0 +1,337 @@
+import asyncio
+import logging
+import random
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Optional, TypeVar
+
+import openai
+
+from consumer.core.config import configure_logging, setting
+from consumer.core.exceptions import ExceptLlmUnavailableError
+from consumer.core.histogram import Histogram
+from consumer.core.scheduler import parse_retry_after
+
+configure_logging(logging.INFO)
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+PRIMARY_PROVIDER = "primary"
+SECONDARY_PROVIDER = "secondary"
+# дубли запросов к основному провайдеру (резервный не настроен) учитываются отдельно:
+# по задержкам основного провайдера выбирается момент дублирования
+HEDGE_SERIES = "hedge"
+# длительность потоковых ответов (до последнего фрагмента) несравнима с задержкой обычного ответа
+# и на момент дублирования не влияет
+STREAM_SERIES = "stream"
+
+# ошибки, после которых запрос к LLM имеет смысл повторить
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError)
+
+
+class AimdLimiter:
+    """
+    Адаптивный лимит одновременных запросов (AIMD): после каждого успешного ответа
+    лимит растёт примерно на единицу за «окно» из limit запросов, при перегрузке
+    провайдера (429, 5xx, таймаут) уменьшается вдвое, но не чаще раза в секунду.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, decrease_factor: float = 0.5) -> None:
+        self.limit: float = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        self.in_flight: int = 0
+        self._last_decrease: float = 0.0
+        self._cond = asyncio.Condition()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+
+    def on_success(self) -> None:
+        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    def on_overload(self) -> None:
+        now = time.monotonic()
+        # одновременные отказы одной волны уменьшают лимит один раз
+        if now - self._last_decrease < 1.0:
+            return
+        self._last_decrease = now
+        self.limit = max(self.minimum, self.limit * self.decrease_factor)
+        logger.warning(f"Провайдер LLM перегружен, лимит одновременных запросов: {int(self.limit)}")
+
+
+class CircuitBreaker:
+    """
+    Автомат защиты провайдера LLM.
+    После failure_threshold ошибок подряд запросы приостанавливаются на open_seconds
+    (closed -> open). Затем пропускается один пробный запрос (half_open): при успехе
+    работа возобновляется, при ошибке пауза удваивается, но не больше max_open_seconds.
+    """
+
+    def __init__(self, failure_threshold: int, open_seconds: float, max_open_seconds: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.state: str = "closed"
+        self._failures: int = 0
+        self._opened_at: float = 0.0
+        self._open_for: float = open_seconds
+        self._probe_in_flight: bool = False
+        self._changed = asyncio.Event()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def _wait_change(self, timeout: Optional[float]) -> None:
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def wait_available(self, probe: bool = False) -> None:
+        """
+        Ожидание, пока провайдер считается доступным.
+        С probe=True вызывающий в состоянии half_open становится пробным запросом
+        или ждёт его результата, а во время паузы сразу получает ExceptLlmUnavailableError;
+        без probe достаточно окончания паузы.
+        """
+        while True:
+            if self.state == "closed":
+                return
+            if self.state == "open":
+                remaining = self._opened_at + self._open_for - time.monotonic()
+                if remaining > 0 and probe:
+                    raise ExceptLlmUnavailableError("Провайдер LLM недоступен")
+                if remaining > 0:
+                    await self._wait_change(remaining)
+                    continue
+                self.state = "half_open"
+                logger.info("Пауза запросов к LLM истекла, пробный запрос")
+            if not probe:
+                return
+            if not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            await self._wait_change(None)
+
+    def release_probe(self) -> None:
+        """Пробный запрос завершился без ответа о состоянии провайдера (отмена, ошибка запроса)."""
+        if self._probe_in_flight:
+            self._probe_in_flight = False
+            self._notify()
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._probe_in_flight = False
+        if self.state != "closed":
+            self.state = "closed"
+            self._open_for = self.open_seconds
+            logger.info("✅ Провайдер LLM снова доступен")
+            self._notify()
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self.state == "half_open":
+            self._open_for = min(self.max_open_seconds, self._open_for * 2)
+        elif self.state != "closed" or self._failures < self.failure_threshold:
+            return
+        self.state = "open"
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+        logger.error(f"⛔ Провайдер LLM недоступен, запросы приостановлены на {self._open_for:.0f} сек")
+        self._notify()
+
+
+class LlmGateway:
+    """
+    Общая точка вызова LLM для всех агентов: адаптивный лимит одновременных запросов,
+    повтор с экспоненциальной задержкой и случайным разбросом при 429/5xx и ошибках
+    соединения, автомат защиты, который останавливает обработку очереди, пока провайдер
+    недоступен, вместо того чтобы тратить сообщения на заведомо неудачные запросы.
+    Автомат проверяется перед каждым вызовом: если он открылся во время обработки сообщения,
+    вызов сразу завершается ExceptLlmUnavailableError, и обработчик возвращает сообщение в очередь.
+    """
+
+    def __init__(self) -> None:
+        config = setting.gateway
+        self.limiter = AimdLimiter(
+            config.llm_concurrency_initial, config.llm_concurrency_min, config.llm_concurrency_max
+        )
+        self.breaker = CircuitBreaker(
+            config.llm_breaker_failures, config.llm_breaker_open_seconds, config.llm_breaker_max_open_seconds
+        )
+        # задержки ответов по паре (провайдер или дубль, агент), у отменённых запросов — время до отмены:
+        # момент дублирующего запроса выбирается по задержкам основного провайдера для того же агента
+        self.latency: dict[tuple[str, str], Histogram] = defaultdict(Histogram)
+        self.hedges: int = 0
+        self.hedge_wins: int = 0
+
+    async def wait_available(self) -> None:
+        """Ожидание доступности провайдера перед обработкой сообщения из очереди."""
+        if self.breaker.state != "closed":
+            logger.info("Обработка очереди приостановлена до восстановления провайдера LLM")
+        await self.breaker.wait_available()
+
+    async def _acquire_breaker(self) -> None:
+        try:
+            await asyncio.wait_for(self.breaker.wait_available(probe=True), setting.gateway.llm_breaker_max_wait)
+        except asyncio.TimeoutError:
+            raise ExceptLlmUnavailableError("Провайдер LLM недоступен")
+
+    def _on_error(self, error: Exception) -> None:
+        self.breaker.record_failure()
+        if not isinstance(error, openai.APIConnectionError) or isinstance(error, openai.APITimeoutError):
+            self.limiter.on_overload()
+
+    def _on_success(self) -> None:
+        self.limiter.on_success()
+        self.breaker.record_success()
+
+    @staticmethod
+    def _backoff(attempt: int, error: Exception) -> float:
+        retry_after = None
+        if isinstance(error, openai.APIStatusError):
+            retry_after = parse_retry_after(error.response.headers.get("retry-after"))
+        # full jitter: равномерно от нуля до экспоненциальной границы
+        delay = random.uniform(0, min(setting.gateway.llm_backoff_max, setting.gateway.llm_backoff_base * 2**attempt))
+        return max(delay, retry_after or 0.0)
+
+    async def _timed(self, series: str, agent: str, func: Callable[[], Awaitable[T]]) -> T:
+        start = time.perf_counter()
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            # запрос отменён, потому что дубль ответил раньше: ответ пришёл бы не раньше момента отмены.
+            # Время до отмены учитывается как нижняя оценка, иначе самые медленные ответы выпадают из гистограммы
+            self.latency[series, agent].observe(time.perf_counter() - start)
+            raise
+        self.latency[series, agent].observe(time.perf_counter() - start)
+        return result
+
+    def hedge_delay(self, agent: str) -> float:
+        """Время ожидания ответа основного провайдера, после которого отправляется дублирующий запрос агента."""
+        config = setting.gateway
+        histogram = self.latency[PRIMARY_PROVIDER, agent]
+        if histogram.count < config.llm_hedge_min_samples:
+            return config.llm_hedge_initial_delay
+        delay = histogram.quantile(config.llm_hedge_percentile)
+        return min(config.llm_hedge_max_delay, max(config.llm_hedge_min_delay, delay))
+
+    async def _hedged(self, agent: str, func: Callable[[], Awaitable[T]], hedge: Callable[[], Awaitable[T]]) -> T:
+        """
+        Запрос с дублированием: если ответ не пришёл за hedge_delay(), тот же запрос
+        отправляется ещё раз (резервному провайдеру, если он настроен), используется
+        первый успешный ответ, оставшийся запрос отменяется.
+        """
+        primary = asyncio.ensure_future(self._timed(PRIMARY_PROVIDER, agent, func))
+        pending = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=self.hedge_delay(agent))
+            if done:
+                return primary.result()
+
+            series = SECONDARY_PROVIDER if setting.gateway.llm_secondary_base_url else HEDGE_SERIES
+            logger.info(f"Ответ LLM ({agent}) задерживается, дублирующий запрос ({series})")
+            self.hedges += 1
+            secondary = asyncio.ensure_future(self._timed(series, agent, hedge))
+            pending.add(secondary)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is secondary:
+                            self.hedge_wins += 1
+                        return task.result()
+            # оба запроса завершились ошибкой: решение о повторе принимается по ошибке основного
+            raise primary.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def call(
+        self, agent: str, func: Callable[[], Awaitable[T]], hedge: Optional[Callable[[], Awaitable[T]]] = None
+    ) -> T:
+        """
+        Вызов func() (запрос к LLM) с лимитом, повторами и автоматом защиты.
+        hedge — тот же запрос для дублирования медленных ответов (при llm_hedge_enabled).
+        """
+        retries = setting.gateway.llm_retries
+        for attempt in range(retries + 1):
+            await self._acquire_breaker()
+            async with self.limiter.slot():
+                try:
+                    if hedge is not None and setting.gateway.llm_hedge_enabled:
+                        result = await self._hedged(agent, func, hedge)
+                    else:
+                        result = await self._timed(PRIMARY_PROVIDER, agent, func)
+                except RETRYABLE_ERRORS as e:
+                    self._on_error(e)
+                    if attempt >= retries:
+                        raise
+                    delay = self._backoff(attempt, e)
+                    logger.warning(f"Ошибка LLM ({agent}): {e!r}, повтор {attempt + 1}/{retries} через {delay:.1f} сек")
+                except BaseException:
+                    # ошибка самого запроса (например, 400) или отмена: место пробного запроса освобождается
+                    self.breaker.release_probe()
+                    raise
+                else:
+                    self._on_success()
+                    return result
+            await asyncio.sleep(delay)
+
+    async def stream(self, agent: str, factory: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+        """
+        Потоковый вызов LLM. Повтор возможен, только пока не получен первый фрагмент ответа:
+        после этого ошибка передаётся вызывающему.
+        """
+        retries = setting.gateway.llm_retries
+        for attempt in range(retries + 1):
+            await self._acquire_breaker()
+            async with self.limiter.slot():
+                started = False
+                start = time.perf_counter()
+                try:
+                    async for item in factory():
+                        started = True
+                        yield item
+                except RETRYABLE_ERRORS as e:
+                    self._on_error(e)
+                    if started or attempt >= retries:
+                        raise
+                    delay = self._backoff(attempt, e)
+                    logger.warning(f"Ошибка LLM ({agent}): {e!r}, повтор {attempt + 1}/{retries} через {delay:.1f} сек")
+                except BaseException:
+                    self.breaker.release_probe()
+                    raise
+                else:
+                    self.latency[STREAM_SERIES, agent].observe(time.perf_counter() - start)
+                    self._on_success()
+                    return
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict[str, float]:
+        result: dict[str, float] = {
+            "concurrency_limit": round(self.limiter.limit, 2),
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        }
+        for (series, agent), histogram in self.latency.items():
+            for q in (0.5, 0.95, 0.99):
+                result[f"{series}_{agent}_p{round(q * 100)}"] = round(histogram.quantile(q), 3)
+        return result
+
+
+llm_gateway = LlmGateway()
@@ -0,0 +1,53 @@
+import hashlib
+import logging
+from typing import Any, Optional
+
+from consumer.core.config import LLM_CACHE_PATH, WHITESPACE_PATTERN, configure_logging, setting
+from consumer.core.disk_cache import DiskLRUCache
+
+configure_logging(logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class LlmResultCache:
+    """
+    Кэш результатов разбора страниц через LLM.
+    Ключ — хэш извлечённого текста вместе с именем модели и версией промпта, поэтому
+    зеркала, AMP-версии и повторная обработка той же страницы не тратят токены,
+    а смена модели или промпта автоматически делает старые записи неактуальными.
+    """
+
+    def __init__(self) -> None:
+        self.enabled: bool = setting.llm_cache.llm_cache_enabled
+        self._cache = DiskLRUCache(
+            LLM_CACHE_PATH,
+            max_bytes=setting.llm_cache.llm_cache_max_mb * 1024 * 1024,
+            ttl=setting.llm_cache.llm_cache_ttl,
+        )
+
+    @staticmethod
+    def make_key(content: str, model: str, prompt_version: str) -> str:
+        normalized = WHITESPACE_PATTERN.sub(" ", content).strip()
+        digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+        return f"{model}:{prompt_version}:{digest}"
+
+    async def open(self):
+        if self.enabled:
+            await self._cache.open()
+
+    async def close(self):
+        if self.enabled:
+            logger.info(f"📊 Статистика кэша LLM: {self._cache.stats()}")
+            await self._cache.close()
+
+    async def get(self, key: str) -> Optional[dict[str, Any]]:
+        if not self.enabled:
+            return None
+        return await self._cache.get(key)
+
+    async def set(self, key: str, value: dict[str, Any]) -> None:
+        if self.enabled:
+            await self._cache.set(key, value)
+
+
+llm_cache = LlmResultCache()
@@ -1,7 +1,9 @@
-from typing import TypedDict
+from typing import Optional, TypedDict
 
 from pydantic import BaseModel, Field
 
+from consumer.core.page import CachedPage
+
 
 class SearchRecipe(BaseModel):
     id: str = Field(description="id рецепта")
@@ -39,3 +41,5 @@ class ParsingState(TypedDict):
     url: str
     status: str
     recipes: list[ParsingRecipe]
+    page: Optional[CachedPage]  # загруженная страница
+    page_from_cache: bool  # страница не изменилась и взята из кэша
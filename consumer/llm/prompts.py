@@ -0,0 +1,58 @@
+import json
+from typing import Any
+
+from pydantic import BaseModel
+
+PROMPT_MODES = ("full", "compact", "structured")
+
+# подписи простых типов в компактном описании формата ответа
+TYPE_SKETCH = {"string": "str", "integer": "int", "number": "float", "boolean": "bool"}
+
+
+def _resolve(schema: dict[str, Any], defs: dict[str, Any]) -> dict[str, Any]:
+    ref = schema.get("$ref")
+    if ref:
+        return defs[ref.rsplit("/", 1)[-1]]
+    return schema
+
+
+def _sketch(schema: dict[str, Any], defs: dict[str, Any]) -> Any:
+    schema = _resolve(schema, defs)
+    schema_type = schema.get("type")
+    if schema_type == "array":
+        return [_sketch(schema.get("items", {}), defs)]
+    if schema_type == "object":
+        if "properties" in schema:
+            return {name: _sketch(prop, defs) for name, prop in schema["properties"].items()}
+        return {"str": _sketch(schema.get("additionalProperties", {"type": "string"}), defs)}
+    return TYPE_SKETCH.get(schema_type, "str")
+
+
+def compact_format_instructions(model: type[BaseModel]) -> str:
+    """
+    Короткая замена get_format_instructions(): вместо полной JSON-схемы с описаниями
+    полей модель получает образец ответа с типами значений.
+    """
+    schema = model.model_json_schema()
+    sketch = _sketch(schema, schema.get("$defs", {}))
+    return "Ответ — только JSON вида: " + json.dumps(sketch, ensure_ascii=False, separators=(",", ":"))
+
+
+def _minify(schema: dict[str, Any], defs: dict[str, Any]) -> dict[str, Any]:
+    schema = _resolve(schema, defs)
+    minified = {key: value for key, value in schema.items() if key not in ("title", "description", "$defs")}
+    if "properties" in minified:
+        minified["properties"] = {name: _minify(prop, defs) for name, prop in minified["properties"].items()}
+    for key in ("items", "additionalProperties"):
+        if isinstance(minified.get(key), dict):
+            minified[key] = _minify(minified[key], defs)
+    return minified
+
+
+def minified_schema(model: type[BaseModel]) -> dict[str, Any]:
+    """JSON-схема модели без описаний и ссылок $defs — для нативного structured output."""
+    schema = model.model_json_schema()
+    minified = _minify(schema, schema.get("$defs", {}))
+    # имя схемы становится именем функции в запросе к модели
+    minified["title"] = schema["title"]
+    return minified
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+from langchain_core.exceptions import OutputParserException
+
+from consumer.core.config import configure_logging
+from consumer.core.metrics import metrics
+
+configure_logging(logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class TokenUsage:
+    """Учёт токенов запросов к LLM по агентам и режимам промпта."""
+
+    def __init__(self) -> None:
+        self._totals: dict[tuple[str, str], dict[str, int]] = defaultdict(
+            lambda: {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        )
+
+    def record(self, agent: str, mode: str, usage: Optional[dict[str, Any]]) -> None:
+        """Учёт usage_metadata ответа модели (input_tokens / output_tokens)."""
+        totals = self._totals[(agent, mode)]
+        totals["calls"] += 1
+        if not usage:
+            return
+        totals["prompt_tokens"] += usage.get("input_tokens", 0)
+        totals["completion_tokens"] += usage.get("output_tokens", 0)
+        logger.info(
+            f"Токены {agent} ({mode}): prompt={usage.get('input_tokens', 0)}, "
+            f"completion={usage.get('output_tokens', 0)}"
+        )
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        result: dict[str, dict[str, float]] = {}
+        for (agent, mode), totals in self._totals.items():
+            calls = totals["calls"] or 1
+            result[f"{agent}/{mode}"] = {
+                **totals,
+                "avg_prompt_tokens": round(totals["prompt_tokens"] / calls, 1),
+                "avg_completion_tokens": round(totals["completion_tokens"] / calls, 1),
+            }
+        return result
+
+
+token_usage = TokenUsage()
+
+
+# границы корзин числа токенов в запросе и ответе
+TOKEN_BUCKETS: tuple[float, ...] = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+llm_calls = metrics.counter("llm_calls_total", "LLM calls by agent, model, cache status and outcome")
+llm_latency = metrics.histogram("llm_latency_seconds", "Total latency of LLM call including retries, sec")
+llm_ttft = metrics.histogram("llm_time_to_first_token_seconds", "Time to the first token of LLM answer, sec")
+llm_prompt_tokens = metrics.histogram("llm_prompt_tokens", "Prompt tokens of LLM call", TOKEN_BUCKETS)
+llm_completion_tokens = metrics.histogram("llm_completion_tokens", "Completion tokens of LLM call", TOKEN_BUCKETS)
+
+
+class LlmCall:
+    """Измерения одного вызова LLM; usage и время первого токена заполняются по ходу вызова."""
+
+    def __init__(self, agent: str, model: str, mode: str) -> None:
+        self.agent = agent
+        self.model = model
+        self.mode = mode
+        self.usage: Optional[dict[str, Any]] = None
+        self.started: float = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+
+    def first_token(self) -> None:
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+    def finish(self, outcome: str) -> None:
+        llm_calls.inc(agent=self.agent, model=self.model, cache="miss", outcome=outcome)
+        if outcome not in ("ok", "parse_error"):
+            # ответа модели нет: ни задержки ответа, ни токенов
+            return
+        now = time.perf_counter()
+        llm_latency.observe(now - self.started, agent=self.agent, model=self.model)
+        # без потоковой выдачи первый токен приходит вместе со всем ответом
+        llm_ttft.observe((self.first_token_at or now) - self.started, agent=self.agent, model=self.model)
+        if self.usage:
+            llm_prompt_tokens.observe(self.usage.get("input_tokens", 0), agent=self.agent, model=self.model)
+            llm_completion_tokens.observe(self.usage.get("output_tokens", 0), agent=self.agent, model=self.model)
+        token_usage.record(self.agent, self.mode, self.usage)
+
+
+@contextmanager
+def track_llm_call(agent: str, model: str, mode: str) -> Iterator[LlmCall]:
+    """
+    Учёт вызова LLM: модель, токены, время до первого токена, общая задержка и результат
+    (ok, parse_error — ответ не разобран, error, cancelled).
+    """
+    call = LlmCall(agent, model, mode)
+    outcome = "ok"
+    try:
+        yield call
+    except OutputParserException:
+        outcome = "parse_error"
+        raise
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        call.finish(outcome)
+
+
+def record_cache_hit(agent: str, model: str) -> None:
+    """Ответ взят из кэша без обращения к LLM."""
+    llm_calls.inc(agent=agent, model=model, cache="hit", outcome="ok")
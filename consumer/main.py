@@ -1,13 +1,22 @@
 import asyncio
 import logging
 from faststream import FastStream
+from faststream.exceptions import NackMessage
 
 from consumer.core.config import bot, broker
-from consumer.core.exceptions import ExceptProcessRecipeError
+from consumer.core.exceptions import ExceptLlmUnavailableError, ExceptProcessRecipeError
 from consumer.llm.llm_states import SearchRecipesList
 from consumer.vectoring.models.chroma import chrome
 from consumer.utils.parser import process_recipe
 from consumer.core.database import MongoManager
+from consumer.core.executor import cpu_executor
+from consumer.core.http_client import http_client
+from consumer.core.metrics import metrics_server
+from consumer.core.page_cache import page_cache
+from consumer.llm.agents import agent_registry
+from consumer.llm.gateway import llm_gateway
+from consumer.llm.llm_cache import llm_cache
+from consumer.utils.inflight import notify_waiters, refresh_inflight
 from consumer.utils.search import search_recipe
 
 
@@ -24,6 +33,16 @@ async def connect_to_mongo():
     logger.info("Подключение к MongoDB установлено.")
     """Подключение к chromeDB при старте FastStream."""
     await chrome.init()
+    """Создание общего пула HTTP-соединений для загрузки страниц."""
+    await http_client.connect()
+    await page_cache.open()
+    await llm_cache.open()
+    """Создание долгоживущих агентов LLM (клиент, промпты и граф строятся один раз)."""
+    await agent_registry.init()
+    """Запуск пула процессов для CPU-ёмких шагов обработки."""
+    await cpu_executor.start()
+    """Запуск HTTP-сервера метрик Prometheus (если задан METRICS_PORT)."""
+    await metrics_server.start()
 
 
 @app.on_shutdown
@@ -31,15 +50,27 @@ async def close_mongo():
     """Закрытие соединения с MongoDB при завершении работы."""
     await mongo_manager.close()
     logger.info("Соединение с MongoDB закрыто.")
+    await page_cache.close()
+    await llm_cache.close()
+    await agent_registry.close()
+    await http_client.close()
+    await cpu_executor.shutdown()
+    await chrome.close()
+    await metrics_server.close()
 
 
 @broker.subscriber("recipe_processing_queue")
 async def handle_recipe_message(data: dict[str, str | int]):
     """Обработчик сообщений из очереди RabbitMQ."""
     url: str = data["url"]
+    # адрес для загрузки страницы; url — канонический адрес (ключ дублей), в старых сообщениях только он
+    fetch_url: str = data.get("fetch_url") or url
     user_id: int = data["user_id"]
     chat_id: int = data["chat_id"]
 
+    # пока провайдер LLM недоступен, сообщение не подтверждается и очередь не читается дальше
+    await llm_gateway.wait_available()
+    requeue = False
     try:
         await process_recipe(
             bot=bot,
@@ -47,9 +78,24 @@ async def handle_recipe_message(data: dict[str, str | int]):
             user_id=user_id,
             url=url,
             mongo=mongo_manager,
+            fetch_url=fetch_url,
         )
+    except ExceptLlmUnavailableError:
+        # провайдер стал недоступен во время обработки: сообщение возвращается в очередь
+        # и снова обрабатывается после восстановления (ожидание в начале обработчика)
+        logger.warning(f"Провайдер LLM недоступен, ссылка {url} возвращена в очередь")
+        requeue = True
     except ExceptProcessRecipeError as e:
         logger.exception(f"Ошибка при обработке рецепта: {e}")
+    finally:
+        # участники, приславшие ту же ссылку во время обработки, получают результат этой задачи
+        # (при возврате в очередь — результат повторной обработки)
+        if not requeue:
+            await notify_waiters(bot=bot, url=url, mongo=mongo_manager)
+    if requeue:
+        # отметка об обработке продлевается на каждую попытку, иначе она истечёт за время недоступности провайдера
+        await refresh_inflight(url=url, user_id=user_id, chat_id=chat_id)
+        raise NackMessage(requeue=True)
 
 
 @broker.subscriber("recipe_search_queue")
@@ -60,11 +106,16 @@ async def handle_recipe_search(data: dict[str, str | int]):
     chat_id: int = data["chat_id"]
     logger.info(f"Старт поиска рецепта по запросу: {search_text}")
 
+    await llm_gateway.wait_available()
+
     try:
         results: SearchRecipesList = await search_recipe(search_text)
         logger.info(f"Найдено результатов: {len(results['recipes'])}")
         for num, recipe in enumerate(results["recipes"]):
             logger.info(f"ID {num+1}-ого рецепта: {recipe['id']}")
+    except ExceptLlmUnavailableError:
+        logger.warning(f"Провайдер LLM недоступен, запрос '{search_text}' возвращён в очередь")
+        raise NackMessage(requeue=True)
     except Exception as e:
         logger.exception(f"Ошибка при поиске рецептов: {e}")
 
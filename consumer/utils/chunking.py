@@ -0,0 +1,23 @@
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+
+def split_texts(
+    texts: list[str], metadatas: list[dict[str, str]], chunk_size: int, chunk_overlap: int
+) -> list[Document]:
+    """
+    Разделение текстов нескольких рецептов на чанки одним сплиттером с сохранением метаданных.
+    Функция верхнего уровня с лёгкими импортами, чтобы её можно было выполнять в пуле процессов.
+    """
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        is_separator_regex=False,
+    )
+    return text_splitter.create_documents(texts=texts, metadatas=metadatas)
+
+
+def split_text(text: str, metadata: dict[str, str], chunk_size: int, chunk_overlap: int) -> list[Document]:
+    """Разделение текста одного рецепта на чанки с сохранением метаданных."""
+    return split_texts([text], [metadata], chunk_size, chunk_overlap)
@@ -0,0 +1,151 @@
+from functools import lru_cache
+from typing import Any, Iterable, Optional
+
+from bs4 import BeautifulSoup, Tag
+
+from consumer.utils.readability import ExtractedText, ReadabilityExtractor
+
+
+def _split_lines(strings: Iterable[str]) -> list[str]:
+    return [line.strip() for string in strings for line in string.split("\n") if line.strip()]
+
+
+class SoupExtractor(ReadabilityExtractor[Tag]):
+    """Извлечение текста через BeautifulSoup (по умолчанию чистый Python-парсер html.parser)."""
+
+    name = "bs4"
+
+    def __init__(self, features: str = "html.parser", **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.features = features
+
+    def parse(self, html: str) -> BeautifulSoup:
+        return BeautifulSoup(html, self.features)
+
+    def root(self, document: BeautifulSoup) -> Tag:
+        return document.body or document
+
+    def find_all(self, root: Tag, names: Optional[Iterable[str]] = None) -> list[Tag]:
+        return root.find_all(list(names) if names is not None else True)
+
+    def tag_name(self, node: Tag) -> str:
+        return node.name
+
+    def class_and_id(self, node: Tag) -> str:
+        classes = node.get("class") or []
+        if isinstance(classes, str):
+            classes = [classes]
+        return " ".join(classes) + " " + (node.get("id") or "")
+
+    def text(self, node: Tag) -> str:
+        return node.get_text(" ", strip=True)
+
+    def lines(self, node: Tag) -> list[str]:
+        return _split_lines(node.get_text(separator="\n", strip=True).split("\n"))
+
+    def link_text_length(self, node: Tag) -> int:
+        return sum(len(link.get_text(" ", strip=True)) for link in node.find_all("a"))
+
+    def parent(self, node: Tag) -> Optional[Tag]:
+        return node.parent
+
+    def children(self, node: Tag) -> list[Tag]:
+        return [child for child in node.children if isinstance(child, Tag)]
+
+    def remove(self, node: Tag) -> None:
+        node.decompose()
+
+    def is_removed(self, node: Tag, root: Tag) -> bool:
+        return node.decomposed
+
+
+class LxmlExtractor(ReadabilityExtractor):
+    """Извлечение текста через lxml (libxml2): разбор и обход дерева выполняются в C."""
+
+    name = "lxml"
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        # импорт внутри, чтобы без установленного lxml оставался доступен бэкенд bs4
+        from lxml import html
+
+        self._html = html
+
+    def parse(self, html: str):
+        if not html.strip():
+            html = "<html></html>"
+        try:
+            document = self._html.document_fromstring(html)
+        except ValueError:
+            # XHTML с объявлением <?xml encoding=...?> lxml принимает только в байтах
+            document = self._html.document_fromstring(html.encode("utf-8"))
+        # комментарии не являются текстом страницы (BeautifulSoup их тоже пропускает)
+        for comment in document.xpath("//comment()"):
+            comment.drop_tree()
+        return document
+
+    def root(self, document):
+        body = document.find("body")
+        return body if body is not None else document
+
+    def find_all(self, root, names: Optional[Iterable[str]] = None) -> list:
+        if names is None:
+            return [element for element in root.iterdescendants() if isinstance(element.tag, str)]
+        return list(root.iterdescendants(*names))
+
+    def tag_name(self, node) -> str:
+        return node.tag if isinstance(node.tag, str) else ""
+
+    def class_and_id(self, node) -> str:
+        return node.get("class", "") + " " + node.get("id", "")
+
+    def text(self, node) -> str:
+        return " ".join(string.strip() for string in self._strings(node) if string.strip())
+
+    def lines(self, node) -> list[str]:
+        return _split_lines(self._strings(node))
+
+    def _strings(self, node) -> list[str]:
+        # хвост самого элемента относится к родителю, поэтому with_tail=False
+        return list(node.itertext(with_tail=False)) if node is not None else []
+
+    def link_text_length(self, node) -> int:
+        return sum(len(self.text(link)) for link in node.iterdescendants("a"))
+
+    def parent(self, node):
+        return node.getparent()
+
+    def children(self, node) -> list:
+        return [child for child in node.iterchildren() if isinstance(child.tag, str)]
+
+    def remove(self, node) -> None:
+        node.drop_tree()
+
+    def is_removed(self, node, root) -> bool:
+        for ancestor in node.iterancestors():
+            if ancestor is root:
+                return False
+        return True
+
+
+EXTRACTORS: dict[str, type[ReadabilityExtractor]] = {
+    SoupExtractor.name: SoupExtractor,
+    LxmlExtractor.name: LxmlExtractor,
+}
+
+
+@lru_cache
+def get_extractor(name: str, **options: Any) -> ReadabilityExtractor:
+    """
+    Экстрактор по имени бэкенда; options — параметры ReadabilityExtractor (main_content, min_main_chars, max_lines).
+    Модуль не импортирует consumer.core.config: extract_text выполняется в пуле процессов.
+    """
+    try:
+        extractor_cls = EXTRACTORS[name]
+    except KeyError:
+        raise ValueError(f"Неизвестный бэкенд извлечения текста: {name}. Доступны: {', '.join(EXTRACTORS)}")
+    return extractor_cls(**options)
+
+
+def extract_text(html: str, backend: str, options: Optional[dict[str, Any]] = None) -> ExtractedText:
+    return get_extractor(backend, **(options or {})).extract(html)
@@ -0,0 +1,78 @@
+import json
+import logging
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError
+from redis.exceptions import RedisError
+
+from consumer.core.config import configure_logging, setting, storage
+from consumer.core.database import MongoManager
+
+configure_logging(logging.INFO)
+logger = logging.getLogger(__name__)
+
+# ключи совпадают с реестром бота (src/utils/inflight.py)
+INFLIGHT_KEY_PREFIX = "inflight:"
+WAITERS_KEY_SUFFIX = ":waiters"
+
+
+async def refresh_inflight(url: str, user_id: int, chat_id: int) -> None:
+    """
+    Продление отметки об обработке URL, когда сообщение возвращается в очередь.
+    Пока провайдер LLM недоступен, задача может ждать дольше срока отметки бота:
+    без продления повторная ссылка породила бы вторую задачу для того же URL.
+    Отметка восстанавливается, даже если уже истекла, — задача по-прежнему владеет URL.
+    """
+    key = INFLIGHT_KEY_PREFIX + url
+    ttl = setting.parse.url_inflight_ttl
+    requester = json.dumps({"user_id": user_id, "chat_id": chat_id})
+    try:
+        async with storage.redis.pipeline(transaction=True) as pipe:
+            pipe.set(key, requester, ex=ttl)
+            pipe.expire(key + WAITERS_KEY_SUFFIX, ttl)
+            await pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Не удалось продлить обработку ссылки {url}: {e}")
+
+
+async def finish_inflight(url: str) -> list[dict[str, int]]:
+    """
+    Снятие URL с обработки. Возвращает участников, которые прислали ту же ссылку,
+    пока она обрабатывалась, и ждут результата.
+    """
+    key = INFLIGHT_KEY_PREFIX + url
+    try:
+        async with storage.redis.pipeline(transaction=True) as pipe:
+            pipe.smembers(key + WAITERS_KEY_SUFFIX)
+            pipe.delete(key, key + WAITERS_KEY_SUFFIX)
+            members, _ = await pipe.execute()
+    except RedisError as e:
+        logger.error(f"Не удалось снять ссылку {url} с обработки: {e}")
+        return []
+    return [json.loads(member) for member in members]
+
+
+async def notify_waiters(bot: Bot, url: str, mongo: MongoManager) -> None:
+    """Передача результата обработки URL всем ожидающим его участникам."""
+    waiters = await finish_inflight(url)
+    if not waiters:
+        return
+
+    recipe_collection = mongo.get_collection("recipes")
+    recipes = await recipe_collection.find({"url": url}, {"title": 1}).to_list(length=None)
+
+    titles = "\n".join(f"🍽 *{recipe.get('title', 'Без названия')}*" for recipe in recipes)
+    for waiter in waiters:
+        user_id, chat_id = waiter["user_id"], waiter["chat_id"]
+        try:
+            if not recipes:
+                await bot.send_message(user_id, f"Не удалось добавить рецепт по ссылке {url}")
+                continue
+
+            await recipe_collection.update_many({"url": url}, {"$addToSet": {"user_id": user_id, "chat_id": chat_id}})
+            await bot.send_message(
+                user_id, f"В вашу кулинарную книгу добавлены рецепты по ссылке:\n{titles}", parse_mode="Markdown"
+            )
+        except TelegramAPIError as e:
+            logger.warning(f"Не удалось уведомить пользователя {user_id}: {e}")
+    logger.info(f"Результат обработки {url} передан ожидающим: {len(waiters)}")
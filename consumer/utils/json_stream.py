@@ -0,0 +1,80 @@
+import json
+from typing import Any, Optional
+
+
+class JsonArrayStreamParser:
+    """
+    Инкрементальный разбор массива объектов из потока токенов LLM.
+    Текст подаётся кусками через feed(); как только очередной объект массива
+    по ключу key закрыт, он разбирается и возвращается, не дожидаясь конца ответа.
+    Обёртки вокруг JSON (```json, пояснения модели) не мешают разбору.
+    """
+
+    def __init__(self, key: str = "recipes") -> None:
+        self._key = f'"{key}"'
+        self._buffer: str = ""
+        self._pos: int = 0
+        self._array_start: Optional[int] = None
+        self._finished: bool = False
+        self._depth: int = 0  # глубина вложенности внутри массива
+        self._in_string: bool = False
+        self._escape: bool = False
+        self._object_start: Optional[int] = None
+
+    def _find_array(self) -> bool:
+        key_pos = self._buffer.find(self._key)
+        if key_pos == -1:
+            return False
+        bracket = self._buffer.find("[", key_pos + len(self._key))
+        if bracket == -1:
+            return False
+        self._array_start = self._pos = bracket + 1
+        return True
+
+    def feed(self, text: str) -> list[dict[str, Any]]:  # noqa: C901
+        """Добавление очередного куска ответа; возвращает объекты, завершённые в этом куске."""
+        self._buffer += text
+        if self._finished or (self._array_start is None and not self._find_array()):
+            return []
+
+        completed: list[dict[str, Any]] = []
+        buffer = self._buffer
+        for index in range(self._pos, len(buffer)):
+            char = buffer[index]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0 and char == "{":
+                    self._object_start = index
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    # закрылся сам массив
+                    self._finished = True
+                    self._pos = index + 1
+                    return completed
+                self._depth -= 1
+                if self._depth == 0 and self._object_start is not None:
+                    try:
+                        item = json.loads(buffer[self._object_start : index + 1], strict=False)
+                    except json.JSONDecodeError:
+                        item = None
+                    if isinstance(item, dict):
+                        completed.append(item)
+                    self._object_start = None
+        self._pos = len(buffer)
+        return completed
+
+    @property
+    def text(self) -> str:
+        """Весь полученный к этому моменту текст ответа."""
+        return self._buffer
@@ -1,6 +1,9 @@
+import asyncio
 import logging
+from typing import Any, Optional
 
 from aiogram import Bot
+from bson import ObjectId
 from pymongo.errors import (
     DuplicateKeyError,
     OperationFailure,
@@ -11,17 +14,154 @@ from pymongo.errors import (
 )
 
 from consumer.core.config import configure_logging
-from consumer.core.exceptions import ExceptNormalizeTextError, ExceptAddChromaError, ExceptProcessRecipeError
+from consumer.core.exceptions import (
+    ExceptAddChromaError,
+    ExceptLlmUnavailableError,
+    ExceptNormalizeTextError,
+    ExceptProcessRecipeError,
+)
 from consumer.vectoring.models.chroma import chrome
 from consumer.core.database import MongoManager
-from consumer.llm.agents import ParsingAgent
+from consumer.llm.agents import agent_registry
 from consumer.utils.preparation_docs import recipe_to_metadata
+from consumer.utils.segmentation import title_key
 from consumer.vectoring.models.chroma import RecipeVector
 
 configure_logging(logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def recipe_fields(recipe: dict[str, Any]) -> dict[str, Any]:
+    """Поля рецепта, которые сохраняются в MongoDB и попадают в текст для Chroma."""
+    return {
+        "title": recipe.get("title", "Без названия"),
+        "description": recipe.get("description", []),
+        "category": recipe.get("category", "Не указано"),
+        "ingredients": recipe.get("ingredients", {}),
+    }
+
+
+async def save_recipe(
+    bot: Bot,
+    chat_id: int,
+    user_id: int,
+    url: str,
+    recipe: dict[str, Any],
+    mongo: MongoManager,
+) -> Optional[RecipeVector]:
+    """
+    Сохранение одного рецепта в MongoDB и подготовка его текста и метаданных для Chroma.
+    Возвращает None, если рецепт не сохранён (пользователь уже получил сообщение).
+    """
+    recipe_collection = mongo.get_collection("recipes")
+
+    recipe_data = {
+        **recipe_fields(recipe),
+        "url": url,
+        "user_id": [user_id],
+        "chat_id": [chat_id],
+    }
+
+    # Добаваем рецепт в MongoDB
+    try:
+        result = await recipe_collection.insert_one(recipe_data)
+        # logger.info(f"Рецепт добавлен: {result.inserted_id}")
+    except DuplicateKeyError:
+        logger.warning("Такой рецепт уже существует в базе данных.")
+        await bot.send_message(user_id, "Такой рецепт уже есть в базе.")
+        return
+    except (WriteError, WriteConcernError, OperationFailure) as e:
+        logger.error(f"Ошибка записи в MongoDB: {e}")
+        await bot.send_message(user_id, "Ошибка записи в базу данных.")
+        return
+    except ServerSelectionTimeoutError:
+        logger.error("Не удалось подключиться к MongoDB (таймаут соединения).")
+        await bot.send_message(user_id, "Сервер базы данных недоступен.")
+        return
+    except PyMongoError as e:
+        logger.exception(f"Неизвестная ошибка MongoDB: {e}")
+        await bot.send_message(user_id, "Произошла внутренняя ошибка при работе с базой данных.")
+        return
+
+    try:
+        # Преобразовываем рецепт в метаданные для добавления их в Chroma
+        recipe_metadata: RecipeVector = await recipe_to_metadata(recipe_data, result.inserted_id)
+    except ExceptNormalizeTextError as e:
+        logger.error(f"Ошибка при преобразовании рецепта в метаданные: {e}")
+        result_deleted = await recipe_collection.delete_one({"_id": result.inserted_id})
+        if result_deleted.deleted_count == 1:
+            logger.info("Record deleted from MongoDB successfully")
+        else:
+            logger.info("Record not found or already deleted")
+        raise ExceptProcessRecipeError(f"Ошибка при преобразовании рецепта в метаданные: {e}")
+
+    return recipe_metadata
+
+
+async def replace_recipe(saving: asyncio.Task, recipe: dict[str, Any], mongo: MongoManager) -> Optional[RecipeVector]:
+    """
+    Замена рецепта, сохранённого по ходу потоковой выдачи, окончательным рецептом страницы
+    с тем же названием (например, собранным из нескольких сегментов). Запись в MongoDB
+    обновляется по _id, текст для Chroma строится заново; при ошибке остаётся прежний вариант.
+    """
+    previous: Optional[RecipeVector] = await saving
+    if previous is None:
+        return None
+
+    recipe_id = ObjectId(previous.metadata.id)
+    fields = recipe_fields(recipe)
+    try:
+        await mongo.get_collection("recipes").update_one({"_id": recipe_id}, {"$set": fields})
+        return await recipe_to_metadata(fields, recipe_id)
+    except (PyMongoError, ExceptNormalizeTextError) as e:
+        logger.error(f"Не удалось заменить рецепт {recipe_id} окончательным вариантом: {e}")
+        return previous
+
+
+async def index_recipes(recipes: list[RecipeVector], mongo: MongoManager) -> None:
+    """Векторизация сохранённых рецептов страницы в Chroma одним пакетом"""
+    try:
+        await chrome.add_recipes(recipes)
+    except ExceptAddChromaError as e:
+        logger.error(f"Ошибка при векторизации рецептов: {e}")
+        ids = [ObjectId(recipe.metadata.id) for recipe in recipes]
+        result_deleted = await mongo.get_collection("recipes").delete_many({"_id": {"$in": ids}})
+        logger.info(f"Records deleted from MongoDB: {result_deleted.deleted_count} of {len(ids)}")
+        raise ExceptProcessRecipeError(f"Ошибка при векторизации рецептов: {e}")
+
+
+async def index_saved_before_error(results: list[Any], mongo: MongoManager) -> None:
+    """
+    Векторизация рецептов, сохранённых в MongoDB до ошибки разбора страницы: иначе они есть
+    в книге, но не находятся поиском. Ошибка векторизации не заменяет исходную ошибку
+    (записи из MongoDB при ней удаляет index_recipes).
+    """
+    saved = [result for result in results if isinstance(result, RecipeVector)]
+    if not saved:
+        return
+    try:
+        await index_recipes(saved, mongo)
+    except ExceptProcessRecipeError as e:
+        logger.error(f"Рецепты, сохранённые до ошибки разбора, не добавлены в Chroma: {e}")
+
+
+async def discard_saved(results: list[Any], mongo: MongoManager) -> None:
+    """
+    Удаление рецептов, сохранённых до того, как провайдер LLM стал недоступен: сообщение
+    возвращается в очередь, и повторная обработка сохраняет рецепты страницы заново.
+    Рецепты ещё не добавлены в Chroma, поэтому достаточно удалить записи из MongoDB.
+    """
+    ids = [ObjectId(result.metadata.id) for result in results if isinstance(result, RecipeVector)]
+    if not ids:
+        return
+    try:
+        result_deleted = await mongo.get_collection("recipes").delete_many({"_id": {"$in": ids}})
+    except PyMongoError as e:
+        logger.error(f"Не удалось удалить рецепты перед возвратом сообщения в очередь: {e}")
+        return
+    logger.info(f"Records deleted from MongoDB before requeue: {result_deleted.deleted_count} of {len(ids)}")
+
+
 # noqa: C901
 async def process_recipe(
     bot: Bot,
@@ -29,98 +169,101 @@ async def process_recipe(
     user_id: int,
     url: str,
     mongo: MongoManager,
+    fetch_url: Optional[str] = None,
 ) -> None:
-    """Фоновая обработка URL рецепта"""
+    """
+    Фоновая обработка URL рецепта.
+    Рецепты сохраняются в MongoDB по мере того, как модель их дописывает, не дожидаясь конца
+    ответа; в Chroma все рецепты страницы добавляются одним пакетом.
+    url — канонический адрес, под которым сохраняются рецепты; страница загружается по fetch_url.
+    """
+    recipes: list[dict[str, Any]] = []
+    tasks: list[asyncio.Task] = []
+    # позиция рецепта в recipes и задача его сохранения по ключу названия
+    positions: dict[str, int] = {}
+    saving: dict[str, asyncio.Task] = {}
+
+    def schedule(recipe: dict[str, Any], final: bool = False) -> None:
+        key = title_key(str(recipe.get("title", "")))
+        if key not in positions:
+            positions[key] = len(recipes)
+            recipes.append(recipe)
+            saving[key] = asyncio.create_task(save_recipe(bot, chat_id, user_id, url, recipe, mongo))
+            tasks.append(saving[key])
+            return
+        # окончательный рецепт страницы заменяет выданный потоком вариант с тем же названием
+        position = positions[key]
+        if final and recipes[position] != recipe:
+            recipes[position] = recipe
+            tasks.append(asyncio.create_task(replace_recipe(saving[key], recipe, mongo)))
+
     try:
-        agent = ParsingAgent()
-        res = await agent.classify(url)
+        agent = agent_registry.parsing
+        res: dict[str, Any] = {}
+        try:
+            async for event, payload in agent.classify_stream(fetch_url or url):
+                if event == "recipe":
+                    schedule(payload)
+                else:
+                    res = payload
+        except ExceptLlmUnavailableError:
+            # без удаления повторная обработка задвоит рецепты, выданные потоком до ошибки
+            await discard_saved(await asyncio.gather(*tasks, return_exceptions=True), mongo)
+            tasks.clear()
+            raise
+        except Exception:
+            await index_saved_before_error(await asyncio.gather(*tasks, return_exceptions=True), mongo)
+            tasks.clear()
+            raise
+        finally:
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            tasks.clear()
 
         status = res.get("status", "error").lower()
-        if status != "ok":
+        if status != "ok" and not recipes:
             await bot.send_message(
                 user_id,
                 f"Ошибка обработки рецепта: {res.get('status', 'Неизвестная ошибка')}",
             )
             return
 
-        recipes = res.get("recipes", [])
+        # рецепты, не выданные потоком (schema.org, кэш, объединённые сегменты), и окончательные варианты выданных
+        for recipe in res.get("recipes", []):
+            schedule(recipe, final=True)
+        results += await asyncio.gather(*tasks, return_exceptions=True)
+
         if not recipes:
             await bot.send_message(chat_id, "Не найдено рецептов по ссылке.")
             return
 
-        multiple = len(recipes) > 1
+        errors = [result for result in results if isinstance(result, Exception)]
+        # после замены рецепта в результатах два варианта с одним id, в Chroma попадает последний
+        saved = list({result.metadata.id: result for result in results if isinstance(result, RecipeVector)}.values())
+        if saved:
+            await index_recipes(saved, mongo)
+        if errors:
+            raise errors[0]
 
-        recipe_collection = mongo.get_collection("recipes")
+        multiple = len(recipes) > 1
         if multiple:
             msg_parts = ["В вашу кулинарную книгу добавлены новые рецепты: \n"]
         else:
             msg_parts = ["В вашу кулинарную книгу добавлен новый рецепт: \n"]
 
         for index, recipe in enumerate(recipes, start=1):
-            title = recipe.get("title", "Без названия")
-            category = recipe.get("category", "Не указано")
-            ingredients = recipe.get("ingredients", {})
-            steps = recipe.get("description", [])
-
             if multiple:
                 msg_parts.append(f"Рецепт №{index}\n{'―' * 30}")
 
-            msg_parts.append(f"🍽 *{title}*\n📂 Категория: {category}\n")
-
-            recipe_data = {
-                "title": title,
-                "description": steps,
-                "category": category,
-                "ingredients": ingredients,
-                "url": url,
-                "user_id": [user_id],
-                "chat_id": [chat_id],
-            }
-
-            # Добаваем рецепт в MongoDB
-            try:
-                result = await recipe_collection.insert_one(recipe_data)
-                # logger.info(f"Рецепт добавлен: {result.inserted_id}")
-            except DuplicateKeyError:
-                logger.warning("Такой рецепт уже существует в базе данных.")
-                await bot.send_message(user_id, "Такой рецепт уже есть в базе.")
-            except (WriteError, WriteConcernError, OperationFailure) as e:
-                logger.error(f"Ошибка записи в MongoDB: {e}")
-                await bot.send_message(user_id, "Ошибка записи в базу данных.")
-            except ServerSelectionTimeoutError:
-                logger.error("Не удалось подключиться к MongoDB (таймаут соединения).")
-                await bot.send_message(user_id, "Сервер базы данных недоступен.")
-            except PyMongoError as e:
-                logger.exception(f"Неизвестная ошибка MongoDB: {e}")
-                await bot.send_message(user_id, "Произошла внутренняя ошибка при работе с базой данных.")
-
-            try:
-                # Преобразовываем рецепт в метаданные для добавления их в Chroma
-                recipe_metadata: RecipeVector = await recipe_to_metadata(recipe_data, result.inserted_id)
-            except ExceptNormalizeTextError as e:
-                logger.error(f"Ошибка при преобразовании рецепта в метаданные: {e}")
-                result_deleted = await recipe_collection.delete_one({"_id": result.inserted_id})
-                if result_deleted.deleted_count == 1:
-                    logger.info("Record deleted from MongoDB successfully")
-                else:
-                    logger.info("Record not found or already deleted")
-                raise ExceptProcessRecipeError(f"Ошибка при преобразовании рецепта в метаданные: {e}")
-
-            # Добавляем рецепт в Chroma
-            try:
-                await chrome.add_recipe(recipe_metadata)
-            except ExceptAddChromaError as e:
-                logger.error(f"Ошибка при векторизации рецепта: {e}")
-                result_deleted = await recipe_collection.delete_one({"_id": result.inserted_id})
-                if result_deleted.deleted_count == 1:
-                    logger.info("Record deleted from MongoDB successfully")
-                else:
-                    logger.info("Record not found or already deleted")
-                raise ExceptProcessRecipeError(f"Ошибка при векторизации рецепта: {e}")
+            msg_parts.append(
+                f"🍽 *{recipe.get('title', 'Без названия')}*\n📂 Категория: {recipe.get('category', 'Не указано')}\n"
+            )
 
         msg = "\n".join(msg_parts)
         await bot.send_message(user_id, msg, parse_mode="Markdown")
 
+    except ExceptLlmUnavailableError:
+        # сообщение вернётся в очередь, пользователь получит результат повторной обработки
+        raise
     except Exception as e:
         logger.exception(f"Ошибка при обработке рецепта: {e}")
         await bot.send_message(user_id, f"Ошибка при обработке ссылки: {e}")
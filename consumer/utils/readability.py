@@ -0,0 +1,236 @@
+import re
+from abc import ABC, abstractmethod
+from typing import Any, Generic, Iterable, Optional, TypeVar
+
+from pydantic import BaseModel, Field
+
+# элементы, которые никогда не содержат рецепт
+UNLIKELY_TAGS = ["script", "style", "nav", "footer", "header", "aside", "form", "iframe", "noscript", "svg", "button"]
+# классы и id блоков рекламы, комментариев, «похожих рецептов» и т.п.
+NEGATIVE_PATTERN = re.compile(
+    r"comment|sidebar|related|share|social|advert|adv-|banner|promo|sponsor|footer|menu|subscribe|popup|cookie|"
+    r"widget|breadcrumb|pagination|rating|author|tags|similar|recommend|teaser",
+    re.IGNORECASE,
+)
+# такие блоки удаляются всегда, даже если в class есть «recipe» (например, recipe-comments)
+STRONG_NEGATIVE_PATTERN = re.compile(r"comment|advert|sponsor|cookie|popup|related|similar|recommend", re.IGNORECASE)
+# классы и id блоков с рецептом
+POSITIVE_PATTERN = re.compile(
+    r"recipe|ingredient|instruction|step|cooking|article|content|main|post|entry|body|text|рецепт",
+    re.IGNORECASE,
+)
+PARAGRAPH_TAGS = {"p", "li", "td", "pre", "dd"}
+BLOCK_TAGS = {"div", "article", "section", "main", "ul", "ol", "table", "p", "blockquote", "dl", "figure"}
+PROTECTED_TAGS = {"html", "body", "main", "article"}
+TAG_WEIGHTS = {
+    "article": 10,
+    "main": 10,
+    "section": 3,
+    "div": 5,
+    "td": 3,
+    "blockquote": 3,
+    "ol": -3,
+    "ul": -3,
+    "dl": -3,
+    "form": -3,
+    "h1": -5,
+    "h2": -5,
+    "h3": -5,
+    "th": -5,
+}
+
+Node = TypeVar("Node")
+
+
+class ExtractedText(BaseModel):
+    text: str = Field(..., description="текст, передаваемый в LLM")
+    page_chars: int = Field(..., description="размер текста всей страницы до выделения основного блока")
+
+
+def class_weight(class_and_id: str) -> int:
+    """Вес блока по его class и id: положительный для рецепта, отрицательный для «мусора»."""
+    weight = 0
+    if NEGATIVE_PATTERN.search(class_and_id):
+        weight -= 25
+    if POSITIVE_PATTERN.search(class_and_id):
+        weight += 25
+    return weight
+
+
+def paragraph_score(text: str) -> float:
+    """Оценка абзаца: длинный текст со знаками препинания скорее всего содержательный."""
+    return 1 + text.count(",") + text.count(".") * 0.5 + min(len(text) / 100, 3)
+
+
+def link_density(text_length: int, link_text_length: int) -> float:
+    return link_text_length / text_length if text_length else 1.0
+
+
+def min_text_length(tag_name: str) -> int:
+    # пункт списка ингредиентов короткий («Соль — 1 ч. л.»), но важен для рецепта
+    return 3 if tag_name == "li" else 25
+
+
+class ReadabilityExtractor(ABC, Generic[Node]):
+    """
+    Выделение основного блока страницы в стиле алгоритма Readability:
+    абзацы начисляют баллы родителям, итоговая оценка штрафуется за плотность ссылок,
+    к лучшему блоку добавляются соседние блоки с достаточно высокой оценкой.
+
+    Алгоритм не зависит от HTML-парсера: наследники реализуют только операции над узлами дерева.
+    """
+
+    name: str = ""
+
+    def __init__(self, main_content: bool = True, min_main_chars: int = 300, max_lines: int = 2000) -> None:
+        self.main_content = main_content
+        self.min_main_chars = min_main_chars
+        self.max_lines = max_lines
+
+    @abstractmethod
+    def parse(self, html: str) -> Any:
+        """Разбор HTML, возвращает документ."""
+
+    @abstractmethod
+    def root(self, document: Any) -> Node:
+        """Элемент body (или корень документа, если body нет)."""
+
+    @abstractmethod
+    def find_all(self, root: Node, names: Optional[Iterable[str]] = None) -> list[Node]:
+        """Все элементы поддерева в порядке документа, по желанию — только с указанными тегами."""
+
+    @abstractmethod
+    def tag_name(self, node: Node) -> str: ...
+
+    @abstractmethod
+    def class_and_id(self, node: Node) -> str: ...
+
+    @abstractmethod
+    def text(self, node: Node) -> str:
+        """Текст элемента одной строкой."""
+
+    @abstractmethod
+    def lines(self, node: Node) -> list[str]:
+        """Непустые строки текста элемента."""
+
+    @abstractmethod
+    def link_text_length(self, node: Node) -> int: ...
+
+    @abstractmethod
+    def parent(self, node: Node) -> Optional[Node]: ...
+
+    @abstractmethod
+    def children(self, node: Node) -> list[Node]:
+        """Дочерние элементы (без текстовых узлов)."""
+
+    @abstractmethod
+    def remove(self, node: Node) -> None: ...
+
+    @abstractmethod
+    def is_removed(self, node: Node, root: Node) -> bool: ...
+
+    def extract(self, html: str) -> ExtractedText:
+        document = self.parse(html)
+        root = self.root(document)
+        for element in self.find_all(root, UNLIKELY_TAGS):
+            if not self.is_removed(element, root):
+                self.remove(element)
+
+        page_lines = self.lines(root)
+        lines = page_lines
+
+        if self.main_content:
+            self.remove_boilerplate(root)
+            blocks = self.select_main_block(root)
+            main_lines = [line for block in blocks for line in self.lines(block)] if blocks else []
+            if sum(len(line) for line in main_lines) >= self.min_main_chars:
+                lines = main_lines
+
+        return ExtractedText(
+            text="\n".join(lines[: self.max_lines]),
+            page_chars=sum(len(line) + 1 for line in page_lines),
+        )
+
+    def remove_boilerplate(self, root: Node) -> None:
+        """Удаление блоков рекламы, комментариев, меню и т.п. по их class и id."""
+        total_length = len(self.text(root))
+        for element in self.find_all(root):
+            if self.tag_name(element) in PROTECTED_TAGS or self.is_removed(element, root):
+                continue
+            class_and_id = self.class_and_id(element)
+            if not STRONG_NEGATIVE_PATTERN.search(class_and_id) and (
+                not NEGATIVE_PATTERN.search(class_and_id) or POSITIVE_PATTERN.search(class_and_id)
+            ):
+                continue
+            # обёртка всей страницы с классом вроде «has-sidebar» не должна удаляться
+            if len(self.text(element)) > total_length / 2:
+                continue
+            self.remove(element)
+
+    def _has_block_children(self, node: Node) -> bool:
+        return any(self.tag_name(child) in BLOCK_TAGS for child in self.children(node))
+
+    def _score_candidates(self, root: Node) -> tuple[dict[int, float], dict[int, Node]]:
+        """Оценки блоков-кандидатов; ключ — id() элемента, т.к. не все парсеры хэшируют узлы по ссылке."""
+        scores: dict[int, float] = {}
+        nodes: dict[int, Node] = {}
+
+        def add_score(node: Node, score: float) -> None:
+            key = id(node)
+            if key not in scores:
+                nodes[key] = node
+                scores[key] = TAG_WEIGHTS.get(self.tag_name(node), 0) + class_weight(self.class_and_id(node))
+            scores[key] += score
+
+        for element in self.find_all(root):
+            name = self.tag_name(element)
+            if name not in PARAGRAPH_TAGS and not (name == "div" and not self._has_block_children(element)):
+                continue
+            text = self.text(element)
+            if len(text) < min_text_length(name):
+                continue
+
+            score = paragraph_score(text)
+            parent = self.parent(element)
+            if parent is not None:
+                add_score(parent, score)
+                grandparent = self.parent(parent)
+                if grandparent is not None:
+                    add_score(grandparent, score / 2)
+
+        # блоки, состоящие из ссылок (меню, «читайте также»), теряют вес
+        for key, node in nodes.items():
+            scores[key] *= 1 - link_density(len(self.text(node)), self.link_text_length(node))
+        return scores, nodes
+
+    def select_main_block(self, root: Node) -> Optional[list[Node]]:
+        scores, nodes = self._score_candidates(root)
+        if not scores:
+            return None
+
+        top_key = max(scores, key=scores.get)
+        top = nodes[top_key]
+        top_score = scores[top_key]
+
+        # ингредиенты и шаги часто лежат в соседних блоках: поднимаемся к общему родителю,
+        # если он набрал сопоставимую оценку
+        parent = self.parent(top)
+        while parent is not None and parent is not root and scores.get(id(parent), 0) >= top_score * 0.6:
+            top = parent
+            top_score = max(top_score, scores[id(top)])
+            parent = self.parent(top)
+
+        if parent is None:
+            return [top]
+
+        threshold = max(10.0, top_score * 0.2)
+        blocks: list[Node] = []
+        for sibling in self.children(parent):
+            if sibling is top or scores.get(id(sibling), 0) >= threshold:
+                blocks.append(sibling)
+            elif self.tag_name(sibling) == "p":
+                # абзацы рядом с основным блоком оставляем, если в них почти нет ссылок
+                text = self.text(sibling)
+                if len(text) > 80 and link_density(len(text), self.link_text_length(sibling)) < 0.25:
+                    blocks.append(sibling)
+        return blocks
@@ -1,17 +1,21 @@
 import logging
-from typing import Any
+from typing import Any, Optional
 
 from consumer.llm.llm_states import SearchRecipesList
 from consumer.vectoring.models.chroma import chrome
-from consumer.core.config import configure_logging
+from consumer.core.config import configure_logging, setting
+from consumer.core.metrics import metrics
 from consumer.vectoring.models.chroma import RecipeVector
-from consumer.llm.agents import SearchAgent
+from consumer.llm.agents import agent_registry
+from consumer.llm.usage import record_cache_hit
+from consumer.utils.semantic_cache import search_cache
 
 
 configure_logging(logging.INFO)
 logger = logging.getLogger(__name__)
 
-search_agent = SearchAgent()
+# accept — лучший рецепт отдан без LLM, reject — ничего подходящего, llm — переранжирование моделью
+search_rerank = metrics.counter("search_rerank_total", "Search requests by rerank decision: accept, reject, llm")
 
 
 async def format_context(context: list[dict[str, Any]]) -> str:
@@ -23,15 +27,76 @@ async def format_context(context: list[dict[str, Any]]) -> str:
     return "\n---\n".join(formatted_context)
 
 
+def rerank_skip_rate() -> float:
+    """Доля поисковых запросов, на которые ответ дан без переранжирования LLM."""
+    total = sum(search_rerank.values.values())
+    skipped = search_rerank.value(decision="accept") + search_rerank.value(decision="reject")
+    return skipped / total if total else 0.0
+
+
+def gate_results(results: list[dict[str, Any]]) -> Optional[SearchRecipesList]:
+    """
+    Ответ без LLM, если результат векторного поиска однозначен: лучший рецепт с высокой
+    оценкой заметно опережает следующий (accept) или ни один рецепт не похож на запрос
+    (reject). Для неоднозначных результатов возвращается None — их ранжирует SearchAgent.
+    Оценки — релевантность Chroma (больше — ближе), чанки одного рецепта сводятся к лучшему.
+    Рецепт, найденный гибридным поиском только по словам (lexical_only), без LLM не выбирается.
+    """
+    config = setting.search_gate
+    best: dict[str, dict[str, Any]] = {}
+    for item in results:
+        recipe_id = item["metadata"].get("id")
+        if recipe_id not in best or item["score"] > best[recipe_id]["score"]:
+            best[recipe_id] = item
+    ranked = sorted(best.values(), key=lambda item: item["score"], reverse=True)
+
+    # в гибридном поиске рецепт, найденный по словам запроса, не даёт ответить «ничего не найдено»
+    lexical_match = any(item.get("bm25_score", 0.0) > 0 for item in results)
+    if not ranked or (ranked[0]["score"] <= config.search_gate_reject_score and not lexical_match):
+        decision, response = "reject", {"recipes": []}
+    else:
+        top = ranked[0]
+        gap = top["score"] - ranked[1]["score"] if len(ranked) > 1 else top["score"]
+        if (
+            top["score"] >= config.search_gate_accept_score
+            and gap >= config.search_gate_min_gap
+            and not top.get("lexical_only")
+        ):
+            decision = "accept"
+            response = {"recipes": [{"id": top["metadata"]["id"], "category": top["metadata"].get("category", "")}]}
+        else:
+            decision, response = "llm", None
+
+    search_rerank.inc(decision=decision)
+    logger.info(f"Решение по переранжированию: {decision}, доля запросов без LLM: {rerank_skip_rate():.0%}")
+    return response
+
+
 async def search_recipe(query: str) -> SearchRecipesList:
     """Поиск рецепта в ChromaDB."""
+    # версия фиксируется до поиска, чтобы ответ по устаревшей коллекции не попал в кэш как актуальный
+    version = chrome.version
     try:
-        results = await chrome.asimilarity_search(query=query, k=3)
+        embedding = await chrome.embed_query(query)
+        results = await chrome.asimilarity_search(query=query, k=3, embedding=embedding)
     except Exception as e:
         logger.exception(f"Ошибка при поиске рецепта: {e}")
         raise
 
+    if setting.search_gate.search_gate_enabled:
+        gated = gate_results(results)
+        if gated is not None:
+            return gated
+
+    scope = search_cache.scope(results)
+    cached = search_cache.get(embedding, scope, version)
+    if cached is not None:
+        record_cache_hit("search", agent_registry.search.llm.model_name)
+        return cached
+
     formatted_context = await format_context(results)
 
-    response: SearchRecipesList = await search_agent.search_recepts(query=query, content=formatted_context)
+    response: SearchRecipesList = await agent_registry.search.search_recepts(query=query, content=formatted_context)
+    if "recipes" in response:
+        search_cache.put(query, embedding, scope, version, response)
     return response
@@ -0,0 +1,98 @@
+import re
+from typing import Any
+
+# строка со списком ингредиентов: количество с единицей измерения или заголовок раздела
+INGREDIENT_LINE_RE = re.compile(
+    r"ингредиент|\d+(?:[.,/]\d+)?\s*(?:г|гр|кг|мл|л|шт|ст\.|ч\.|стак|зуб|пуч|щеп)\b|по вкусу",
+    re.IGNORECASE,
+)
+HEADING_MAX_CHARS = 80
+HEADING_LOOKAHEAD = 6
+UNKNOWN_CATEGORY = "Не указано"
+
+
+def _is_heading(lines: list[str], index: int) -> bool:
+    """Похожа ли строка на название рецепта: короткая, не предложение и за ней вскоре идут ингредиенты."""
+    line = lines[index].strip()
+    if not line or len(line) > HEADING_MAX_CHARS or line.endswith((".", ",", ";")) or INGREDIENT_LINE_RE.search(line):
+        return False
+    following = lines[index + 1 : index + 1 + HEADING_LOOKAHEAD]
+    return any(INGREDIENT_LINE_RE.search(item) for item in following)
+
+
+def _split_long_block(block: list[str], max_chars: int) -> list[list[str]]:
+    parts: list[list[str]] = [[]]
+    size = 0
+    for line in block:
+        if parts[-1] and size + len(line) + 1 > max_chars:
+            parts.append([])
+            size = 0
+        parts[-1].append(line)
+        size += len(line) + 1
+    return parts
+
+
+def split_into_segments(text: str, max_chars: int) -> list[str]:
+    """
+    Разбиение текста страницы на сегменты не длиннее max_chars для независимого разбора LLM.
+    Границы сегментов по возможности проходят перед названиями рецептов,
+    так что каждый рецепт целиком попадает в один сегмент.
+    """
+    if len(text) <= max_chars:
+        return [text]
+
+    lines = text.splitlines()
+    blocks: list[list[str]] = [[]]
+    for index, line in enumerate(lines):
+        if blocks[-1] and _is_heading(lines, index):
+            blocks.append([])
+        blocks[-1].append(line)
+
+    segments: list[list[str]] = [[]]
+    size = 0
+    for block in blocks:
+        block_size = sum(len(line) + 1 for line in block)
+        if block_size > max_chars:
+            # рецепт длиннее сегмента: режем по строкам, части склеит merge_recipes
+            parts = _split_long_block(block, max_chars)
+        else:
+            parts = [block]
+        for part in parts:
+            part_size = sum(len(line) + 1 for line in part)
+            if segments[-1] and size + part_size > max_chars:
+                segments.append([])
+                size = 0
+            segments[-1].extend(part)
+            size += part_size
+
+    return ["\n".join(segment) for segment in segments if segment]
+
+
+def title_key(title: str) -> str:
+    """Название рецепта, приведённое к виду для сравнения дублей."""
+    return " ".join(re.sub(r"[^\w\s]", " ", title.lower()).split())
+
+
+def merge_recipes(results: list[list[dict[str, Any]]]) -> list[dict[str, Any]]:
+    """
+    Объединение рецептов, найденных в разных сегментах страницы.
+    Рецепты с одинаковым названием считаются одним: ингредиенты объединяются,
+    из шагов приготовления берётся более полный список.
+    """
+    merged: dict[str, dict[str, Any]] = {}
+    for recipes in results:
+        for recipe in recipes:
+            key = title_key(str(recipe.get("title", "")))
+            if not key:
+                continue
+            if key not in merged:
+                merged[key] = dict(recipe)
+                continue
+
+            current = merged[key]
+            current["ingredients"] = {**(recipe.get("ingredients") or {}), **(current.get("ingredients") or {})}
+            if len(recipe.get("description") or []) > len(current.get("description") or []):
+                current["description"] = recipe["description"]
+            if current.get("category") in (None, "", UNKNOWN_CATEGORY) and recipe.get("category"):
+                current["category"] = recipe["category"]
+    return list(merged.values())
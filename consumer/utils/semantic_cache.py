@@ -0,0 +1,112 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from pydantic import BaseModel, Field
+
+from consumer.core.config import configure_logging, setting
+
+configure_logging(logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class CachedAnswer(BaseModel):
+    query: str = Field(..., description="текст запроса")
+    embedding: list[float] = Field(..., description="нормализованный эмбеддинг запроса")
+    answer: dict[str, Any] = Field(..., description="ответ SearchAgent")
+    created_at: float = Field(default_factory=time.time, description="время сохранения ответа")
+
+
+class SemanticSearchCache:
+    """
+    Кэш ответов поиска по смыслу запроса.
+    Ответ переиспользуется, если новый запрос близок к уже заданному (косинусная
+    близость эмбеддингов не ниже порога) и поиск в Chroma вернул тот же набор рецептов.
+    При изменении коллекции (chrome.version) кэш очищается целиком.
+    """
+
+    def __init__(self) -> None:
+        self.enabled: bool = setting.search_cache.search_cache_enabled
+        self._entries: OrderedDict[tuple[str, ...], list[CachedAnswer]] = OrderedDict()
+        self._size: int = 0
+        self._version: Optional[int] = None
+        self.hits: int = 0
+        self.misses: int = 0
+
+    @staticmethod
+    def scope(results: list[dict[str, Any]]) -> tuple[str, ...]:
+        """Набор рецептов-кандидатов, среди которых LLM выбирала ответ."""
+        return tuple(sorted({str(item["metadata"]["id"]) for item in results}))
+
+    @staticmethod
+    def _similarity(a: list[float], b: list[float]) -> float:
+        # эмбеддинги нормализованы, скалярное произведение равно косинусной близости
+        return sum(x * y for x, y in zip(a, b))
+
+    def _check_version(self, version: int) -> None:
+        if self._version != version:
+            if self._size:
+                logger.info("Коллекция рецептов изменилась, кэш поиска очищен")
+            self._entries.clear()
+            self._size = 0
+            self._version = version
+
+    def get(self, embedding: list[float], scope: tuple[str, ...], version: int) -> Optional[dict[str, Any]]:
+        if not self.enabled:
+            return None
+        self._check_version(version)
+
+        entries = self._entries.get(scope, [])
+        now = time.time()
+        fresh = [entry for entry in entries if now - entry.created_at <= setting.search_cache.search_cache_ttl]
+        if len(fresh) != len(entries):
+            self._size -= len(entries) - len(fresh)
+            if fresh:
+                self._entries[scope] = fresh
+            else:
+                self._entries.pop(scope, None)
+
+        best: Optional[CachedAnswer] = None
+        best_score = setting.search_cache.search_cache_threshold
+        for entry in fresh:
+            score = self._similarity(embedding, entry.embedding)
+            if score >= best_score:
+                best, best_score = entry, score
+
+        if best is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(scope)
+        self.hits += 1
+        logger.info(f"Ответ поиска взят из кэша: запрос «{best.query}», близость {best_score:.3f}")
+        return best.answer
+
+    def put(
+        self, query: str, embedding: list[float], scope: tuple[str, ...], version: int, answer: dict[str, Any]
+    ) -> None:
+        if not self.enabled:
+            return
+        self._check_version(version)
+
+        self._entries.setdefault(scope, []).append(CachedAnswer(query=query, embedding=embedding, answer=answer))
+        self._entries.move_to_end(scope)
+        self._size += 1
+
+        # вытесняем наборы рецептов, к которым дольше всего не обращались
+        while self._size > setting.search_cache.search_cache_max_entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    def stats(self) -> dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "entries": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+search_cache = SemanticSearchCache()
@@ -0,0 +1,208 @@
+import json
+import logging
+import re
+from typing import Any, Iterator
+
+from bs4 import BeautifulSoup, Tag
+from pydantic import ValidationError
+
+from consumer.core.patterns import WHITESPACE_PATTERN
+from consumer.llm.llm_states import ParsingRecipe
+
+# модуль выполняется в пуле процессов и не импортирует consumer.core.config
+logger = logging.getLogger(__name__)
+
+JSON_LD_PATTERN = re.compile(
+    r"""<script[^>]*type\s*=\s*["']?application/ld\+json["']?[^>]*>(.*?)</script>""",
+    re.IGNORECASE | re.DOTALL,
+)
+HTML_TAG_PATTERN = re.compile(r"<[^>]+>")
+# "мука — 200 г", "мука: 200 г"
+INGREDIENT_SEPARATOR_PATTERN = re.compile(r"\s+[—–-]\s+|:\s+")
+# "200 г муки", "1/2 ст. л. соли", "2-3 шт. яйца"
+INGREDIENT_LEADING_AMOUNT_PATTERN = re.compile(
+    r"^(?P<amount>[\d½¼¾⅓⅔][\d½¼¾⅓⅔.,/\s-]*"
+    r"(?:\s*(?:кг|г|гр|мг|мл|л|шт|ст\.?\s*л|ч\.?\s*л|стакан\w*|зубч\w*|щепотк\w*|пуч\w*|kg|g|ml|tbsp|tsp|cups?)\.?)?)"
+    r"\s+(?P<name>\D.*)$",
+    re.IGNORECASE,
+)
+# "мука 200 г"
+INGREDIENT_TRAILING_AMOUNT_PATTERN = re.compile(
+    r"^(?P<name>.*?\D)\s+(?P<amount>[\d½¼¾⅓⅔.,/-]+\s*\S{0,10})$",
+    re.IGNORECASE,
+)
+DEFAULT_CATEGORY = "Не указано"
+
+
+def _clean(text: Any) -> str:
+    if not isinstance(text, str):
+        return ""
+    return WHITESPACE_PATTERN.sub(" ", HTML_TAG_PATTERN.sub(" ", text)).strip()
+
+
+def _is_recipe(item: dict[str, Any]) -> bool:
+    item_type = item.get("@type", "")
+    types = item_type if isinstance(item_type, list) else [item_type]
+    return any(isinstance(t, str) and t.rsplit("/", 1)[-1].lower() == "recipe" for t in types)
+
+
+def _walk_json_ld(data: Any) -> Iterator[dict[str, Any]]:
+    """Обход JSON-LD документа: рецепты могут лежать в списке, в @graph или во вложенных объектах."""
+    if isinstance(data, list):
+        for item in data:
+            yield from _walk_json_ld(item)
+    elif isinstance(data, dict):
+        if _is_recipe(data):
+            yield data
+            return
+        for key in ("@graph", "mainEntity", "mainEntityOfPage", "itemListElement", "item"):
+            if key in data:
+                yield from _walk_json_ld(data[key])
+
+
+def _split_ingredient(text: str) -> tuple[str, str]:
+    """Разбиение строки ингредиента на название и количество."""
+    parts = INGREDIENT_SEPARATOR_PATTERN.split(text, maxsplit=1)
+    if len(parts) == 2 and parts[0] and parts[1]:
+        return parts[0].strip(), parts[1].strip()
+
+    match = INGREDIENT_LEADING_AMOUNT_PATTERN.match(text)
+    if match:
+        return match.group("name").strip(), match.group("amount").strip()
+
+    match = INGREDIENT_TRAILING_AMOUNT_PATTERN.match(text)
+    if match:
+        return match.group("name").strip(), match.group("amount").strip()
+
+    return text, ""
+
+
+def _ingredients_to_dict(items: list[str]) -> dict[str, str]:
+    ingredients: dict[str, str] = {}
+    for item in items:
+        text = _clean(item)
+        if not text:
+            continue
+        name, amount = _split_ingredient(text)
+        ingredients[name] = amount
+    return ingredients
+
+
+def _instructions_to_list(instructions: Any) -> list[str]:
+    """Приведение recipeInstructions (строка, HowToStep, HowToSection) к списку шагов."""
+    if isinstance(instructions, str):
+        text = instructions.replace("<br>", "\n").replace("<br/>", "\n").replace("</p>", "\n")
+        return [step for step in (_clean(line) for line in text.split("\n")) if step]
+    if isinstance(instructions, list):
+        steps: list[str] = []
+        for item in instructions:
+            steps.extend(_instructions_to_list(item))
+        return steps
+    if isinstance(instructions, dict):
+        if "itemListElement" in instructions:
+            return _instructions_to_list(instructions["itemListElement"])
+        text = _clean(instructions.get("text") or instructions.get("name"))
+        return [text] if text else []
+    return []
+
+
+def _first_text(value: Any) -> str:
+    if isinstance(value, list):
+        value = next((item for item in value if isinstance(item, str) and item.strip()), "")
+    return _clean(value)
+
+
+def _to_parsing_recipe(name: Any, ingredients: list[str], instructions: Any, category: Any) -> ParsingRecipe | None:
+    try:
+        recipe = ParsingRecipe(
+            title=_first_text(name),
+            description=_instructions_to_list(instructions),
+            category=_first_text(category) or DEFAULT_CATEGORY,
+            ingredients=_ingredients_to_dict(ingredients),
+        )
+    except ValidationError:
+        return None
+
+    # неполные данные лучше отдать LLM, чем сохранить рецепт без шагов или ингредиентов
+    if not recipe.title or not recipe.description or not recipe.ingredients:
+        return None
+    return recipe
+
+
+def _json_ld_recipes(html: str) -> list[ParsingRecipe]:
+    recipes: list[ParsingRecipe] = []
+    for block in JSON_LD_PATTERN.findall(html):
+        try:
+            data = json.loads(block.strip(), strict=False)
+        except json.JSONDecodeError:
+            continue
+
+        for item in _walk_json_ld(data):
+            ingredients = item.get("recipeIngredient") or item.get("ingredients") or []
+            if isinstance(ingredients, str):
+                ingredients = [ingredients]
+            recipe = _to_parsing_recipe(
+                name=item.get("name") or item.get("headline"),
+                ingredients=[i for i in ingredients if isinstance(i, str)],
+                instructions=item.get("recipeInstructions"),
+                category=item.get("recipeCategory"),
+            )
+            if recipe is not None:
+                recipes.append(recipe)
+    return recipes
+
+
+def _microdata_props(scope: Tag, prop: str) -> list[Tag]:
+    """Свойства itemprop, принадлежащие именно этому itemscope, а не вложенным."""
+    return [
+        element
+        for element in scope.find_all(attrs={"itemprop": re.compile(rf"(^|\s){prop}(\s|$)")})
+        if element.find_parent(attrs={"itemscope": True}) is scope
+    ]
+
+
+def _microdata_value(element: Tag) -> str:
+    for attr in ("content", "datetime", "value"):
+        if element.has_attr(attr):
+            return _clean(element[attr])
+    return _clean(element.get_text(" ", strip=True))
+
+
+def _microdata_recipes(html: str) -> list[ParsingRecipe]:
+    soup = BeautifulSoup(html, "html.parser")
+    recipes: list[ParsingRecipe] = []
+    for scope in soup.find_all(attrs={"itemscope": True, "itemtype": re.compile(r"schema\.org/Recipe", re.I)}):
+        instructions: list[str] = []
+        for element in _microdata_props(scope, "recipeInstructions"):
+            steps = [_microdata_value(li) for li in element.find_all("li")] or [_microdata_value(element)]
+            instructions.extend(step for step in steps if step)
+
+        recipe = _to_parsing_recipe(
+            name=[_microdata_value(e) for e in _microdata_props(scope, "name")],
+            ingredients=[
+                _microdata_value(e)
+                for prop in ("recipeIngredient", "ingredients")
+                for e in _microdata_props(scope, prop)
+            ],
+            instructions=instructions,
+            category=[_microdata_value(e) for e in _microdata_props(scope, "recipeCategory")],
+        )
+        if recipe is not None:
+            recipes.append(recipe)
+    return recipes
+
+
+def extract_structured_recipes(html: str) -> list[dict[str, Any]]:
+    """
+    Извлечение рецептов из разметки schema.org (JSON-LD и Microdata).
+    Возвращает рецепты в формате ParsingRecipe; пустой список означает,
+    что структурированных данных нет и страницу нужно разбирать через LLM.
+    """
+    recipes = _json_ld_recipes(html)
+    if not recipes and re.search(r"schema\.org/Recipe", html, re.IGNORECASE):
+        recipes = _microdata_recipes(html)
+
+    unique: dict[str, ParsingRecipe] = {}
+    for recipe in recipes:
+        unique.setdefault(recipe.title.lower(), recipe)
+    return [recipe.model_dump() for recipe in unique.values()]
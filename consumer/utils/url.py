@@ -0,0 +1,49 @@
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# параметры, которые добавляют рекламные сети и соцсети, на содержимое страницы не влияют
+TRACKING_PARAMS = frozenset(
+    {
+        "fbclid",
+        "gclid",
+        "yclid",
+        "ysclid",
+        "mc_cid",
+        "mc_eid",
+        "igshid",
+        "_openstat",
+        "ref",
+        "from",
+    }
+)
+TRACKING_PREFIXES = ("utm_",)
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Приведение URL к каноническому виду для использования в качестве ключа кэша:
+    схема и хост в нижнем регистре, без порта по умолчанию, фрагмента,
+    трекинговых параметров и завершающего слэша.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower() or "http"
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+
+    netloc = host
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{host}:{parts.port}"
+
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+
+    query_items = [
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    ]
+    query = urlencode(sorted(query_items))
+
+    return urlunsplit((scheme, netloc, path, query, ""))
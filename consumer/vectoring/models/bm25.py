@@ -0,0 +1,84 @@
+import heapq
+import math
+from collections import Counter
+from typing import Any
+
+from consumer.core.config import PUNCTUATION_PATTERN, WHITESPACE_PATTERN
+
+
+def tokenize(text: str) -> list[str]:
+    """Слова текста после той же нормализации, что и в recipe_to_metadata (пунктуация, пробелы, регистр)."""
+    text = WHITESPACE_PATTERN.sub(" ", PUNCTUATION_PATTERN.sub(" ", text))
+    return text.lower().replace("ё", "е").split()
+
+
+class Bm25Index:
+    """
+    Инвертированный индекс чанков рецептов с ранжированием BM25.
+    Пополняется вместе с коллекцией Chroma (те же чанки, идентификаторы и метаданные),
+    при старте строится заново по содержимому коллекции.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self._postings: dict[str, dict[str, int]] = {}  # слово -> {id чанка: число вхождений}
+        self._lengths: dict[str, int] = {}
+        self._documents: dict[str, tuple[str, dict[str, Any]]] = {}
+        self._total_length: int = 0
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def clear(self) -> None:
+        self._postings.clear()
+        self._lengths.clear()
+        self._documents.clear()
+        self._total_length = 0
+
+    def add(self, doc_id: str, text: str, metadata: dict[str, Any]) -> None:
+        if doc_id in self._lengths:
+            return
+        terms = Counter(tokenize(text))
+        for term, frequency in terms.items():
+            self._postings.setdefault(term, {})[doc_id] = frequency
+        length = sum(terms.values())
+        self._lengths[doc_id] = length
+        self._total_length += length
+        self._documents[doc_id] = (text, metadata)
+
+    def document(self, doc_id: str) -> tuple[str, dict[str, Any]]:
+        return self._documents[doc_id]
+
+    def search(self, query: str, k: int) -> list[tuple[str, float]]:
+        """k лучших чанков по BM25: список (id чанка, оценка) по убыванию оценки."""
+        if not self._lengths:
+            return []
+        count = len(self._lengths)
+        average_length = self._total_length / count
+        scores: dict[str, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = 60) -> list[tuple[str, float]]:
+    """
+    Объединение ранжирований по RRF: оценка элемента — сумма 1 / (k + позиция) по всем спискам,
+    где он встречается. Повторы элемента в одном списке учитываются по первой позиции.
+    """
+    scores: dict[str, float] = {}
+    for ranking in rankings:
+        seen: set[str] = set()
+        for item in ranking:
+            if item in seen:
+                continue
+            seen.add(item)
+            scores[item] = scores.get(item, 0.0) + 1 / (k + len(seen))
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -4,17 +4,21 @@ import json
 import time
 from typing import Any
 
-import torch
 from langchain_chroma import Chroma
 from langchain.schema import Document
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_core.embeddings import Embeddings
 from pydantic import BaseModel, Field
 from pydantic.functional_validators import BeforeValidator
 from typing_extensions import Annotated
 
 from consumer.core.config import configure_logging, COLLECTION_NAME, CHROMA_PATH, setting
 from consumer.core.exceptions import ExceptAddChromaError
+from consumer.core.executor import cpu_executor
+from consumer.utils.chunking import split_texts
+from consumer.vectoring.models.bm25 import Bm25Index, reciprocal_rank_fusion
+from consumer.vectoring.models.embedding_cache import CachedEmbeddings
+from consumer.vectoring.models.embedding_worker import BatchingEmbeddings
+from consumer.vectoring.models.embeddings import create_embeddings
 
 PyObjectId = Annotated[str, BeforeValidator(str)]
 
@@ -40,28 +44,26 @@ class ChromaVectorStore:
         Соединение с базой данных будет установлено позже с помощью метода init().
         """
         self._store: Chroma | None = None
+        self._embeddings: Embeddings | None = None
+        # номер версии коллекции, увеличивается при каждом добавлении рецепта
+        self.version: int = 0
+        # лексический индекс тех же чанков для гибридного поиска
+        self._bm25 = Bm25Index(setting.retrieval.bm25_k1, setting.retrieval.bm25_b)
 
     async def init(self):
         """
         Асинхронный метод для инициализации соединения с базой данных Chroma.
-        Создает embeddings на основе модели из настроек, используя CUDA если доступно.
+        Создает embeddings на основе модели из настроек (PyTorch или ONNX Runtime, см. embedding_backend).
         """
         await asyncio.sleep(0.01)
         logger.info("🧠 Инициализация ChromaVectorStore...")
         try:
             start_time = time.time()
 
-            logger.info("Загрузка модели эмбеддингов...")
-
-            # Определяем устройство для вычислений: GPU если доступен, иначе CPU
-            device = "cuda" if torch.cuda.is_available() else "cpu"
-            logger.info(f"🚀 Используем устройство для эмбеддингов: {device}")
-
-            embeddings = HuggingFaceEmbeddings(
-                model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
-                model_kwargs={"device": device},
-                encode_kwargs={"normalize_embeddings": True},
-            )
+            logger.info(f"Загрузка модели эмбеддингов ({setting.embedding.embedding_backend})...")
+            embeddings = self._embeddings = create_embeddings()
+            if isinstance(embeddings, BatchingEmbeddings):
+                await embeddings.start()
             logger.info(f"Модель загружена за {time.time() - start_time:.2f} сек")
 
             # Инициализируем соединение с базой данных Chroma
@@ -72,20 +74,62 @@ class ChromaVectorStore:
             )
 
             logger.info(f"✅ ChromaVectorStore успешно подключен к коллекции " f"'{COLLECTION_NAME}' в '{CHROMA_PATH}'")
+
+            # Построение индекса BM25 по чанкам, уже сохранённым в коллекции
+            data = await asyncio.to_thread(self._store.get, include=["documents", "metadatas"])
+            for doc_id, text, metadata in zip(data["ids"], data["documents"], data["metadatas"]):
+                self._bm25.add(doc_id, text, metadata)
+            logger.info(f"Индекс BM25 построен: {len(self._bm25)} чанков")
         except Exception as e:
             logger.exception(f"❌ Ошибка при инициализации ChromaVectorStore: {e}")
             raise
 
-    async def asimilarity_search(self, query: str, k: int = 3) -> list[dict[str, Any]]:
+    async def reset(self) -> None:
+        """Удаление всех документов коллекции (перед перестроением индекса)."""
+        if not self._store:
+            raise RuntimeError("ChromaVectorStore is not initialized.")
+        await asyncio.to_thread(self._store.reset_collection)
+        self._bm25.clear()
+        self.version += 1
+        logger.info(f"🗑 Коллекция '{COLLECTION_NAME}' очищена")
+
+    async def close(self) -> None:
+        """Остановка воркера эмбеддингов и снятие блокировки кэша эмбеддингов."""
+        embeddings = self._embeddings
+        if isinstance(embeddings, BatchingEmbeddings):
+            await embeddings.close()
+            embeddings = embeddings.embeddings
+        if isinstance(embeddings, CachedEmbeddings):
+            embeddings.store.close()
+
+    def embedding_cache_stats(self) -> dict[str, int]:
+        embeddings = self._embeddings
+        if isinstance(embeddings, BatchingEmbeddings):
+            embeddings = embeddings.embeddings
+        if isinstance(embeddings, CachedEmbeddings):
+            return embeddings.store.stats()
+        return {}
+
+    async def embed_query(self, query: str) -> list[float]:
+        """Нормализованный эмбеддинг запроса той же моделью, что и у коллекции."""
+        if not self._embeddings:
+            raise RuntimeError("ChromaVectorStore is not initialized.")
+        return await self._embeddings.aembed_query(query)
+
+    async def asimilarity_search(
+        self, query: str, k: int = 3, embedding: list[float] | None = None, mode: str | None = None
+    ) -> list[dict[str, Any]]:
         """
         Асинхронный метод для поиска похожих документов в базе данных Chroma.
 
         Args:
             query (str): Текстовый запрос для поиска
             k (int): Количество возвращаемых результатов
+            embedding (list[float] | None): Готовый эмбеддинг запроса, чтобы не вычислять его повторно
+            mode (str | None): vector или hybrid (вектор + BM25), по умолчанию retrieval_mode из настроек
 
         Returns:
-            list: Список найденных документов, возможно с оценками если with_score=True
+            list: Список найденных документов с оценкой score — релевантностью Chroma (больше — ближе)
 
         Raises:
             RuntimeError: Если хранилище не инициализировано
@@ -95,8 +139,17 @@ class ChromaVectorStore:
         if not self._store:
             raise RuntimeError("ChromaVectorStore is not initialized.")
 
+        if (mode or setting.retrieval.retrieval_mode) == "hybrid":
+            return await self.ahybrid_search(query, k, embedding)
+
         try:
-            results = await self._store.asimilarity_search_with_score(query=query, k=k)
+            # в обоих случаях релевантность, а не расстояние: на неё рассчитаны пороги search_gate
+            if embedding is None:
+                results = await self._store.asimilarity_search_with_relevance_scores(query=query, k=k)
+            else:
+                results = await asyncio.to_thread(
+                    self._store.similarity_search_by_vector_with_relevance_scores, embedding=embedding, k=k
+                )
 
             logger.info(f"📄 Найдено {len(results)} результатов.")
 
@@ -117,36 +170,75 @@ class ChromaVectorStore:
             logger.exception(f"❌ Ошибка при поиске: {e}")
             raise
 
-    async def split_text_into_chunks(self, recipe: RecipeVector) -> list[Any]:
-        """Разделение текста на чанки с сохранением метаданных."""
-        await asyncio.sleep(0.01)
+    async def ahybrid_search(
+        self, query: str, k: int = 3, embedding: list[float] | None = None
+    ) -> list[dict[str, Any]]:
+        """
+        Гибридный поиск: кандидаты векторного поиска и BM25 по тем же чанкам объединяются
+        по рецептам методом reciprocal rank fusion. У каждого результата, кроме score
+        (релевантность векторного поиска), есть bm25_score и rrf_score. Рецепт, найденный
+        только по словам, не вошёл в кандидаты векторного поиска: его score — релевантность
+        худшего кандидата (оценка сверху), а lexical_only=True.
+        """
+        config = setting.retrieval
+        if embedding is None:
+            embedding = await self.embed_query(query)
+        dense = await self.asimilarity_search(query, k=config.retrieval_candidates, embedding=embedding, mode="vector")
+        lexical = self._bm25.search(query, config.retrieval_candidates)
+
+        # лучший чанк каждого рецепта: из векторного поиска, если рецепт там есть
+        recipes: dict[str, dict[str, Any]] = {}
+        for item in dense:
+            recipes.setdefault(item["metadata"]["id"], {**item, "bm25_score": 0.0})
+        floor = min((item["score"] for item in dense), default=float("-inf"))
+        lexical_ranking: list[str] = []
+        for doc_id, score in lexical:
+            text, metadata = self._bm25.document(doc_id)
+            lexical_ranking.append(metadata["id"])
+            recipe = recipes.setdefault(
+                metadata["id"], {"text": text, "metadata": metadata, "score": floor, "lexical_only": True}
+            )
+            recipe["bm25_score"] = max(recipe.get("bm25_score", 0.0), score)
+
+        dense_ranking = [item["metadata"]["id"] for item in dense]
+        fused = reciprocal_rank_fusion([dense_ranking, lexical_ranking], config.retrieval_rrf_k)
+        logger.info(f"📄 Гибридный поиск: вектор {len(dense)}, BM25 {len(lexical)}, рецептов {len(fused)}")
+        return [{**recipes[recipe_id], "rrf_score": round(score, 5)} for recipe_id, score in fused[:k]]
 
-        ingredients_json: str = json.dumps(recipe.metadata.ingredients, ensure_ascii=False)
-        metadata: dict[str, str] = {
+    @staticmethod
+    def chunk_metadata(recipe: RecipeVector) -> dict[str, str]:
+        """Метаданные, которые сохраняются с каждым чанком рецепта."""
+        return {
             "id": str(recipe.metadata.id),
             "category": recipe.metadata.category,
-            "ingredients": ingredients_json,
+            "ingredients": json.dumps(recipe.metadata.ingredients, ensure_ascii=False),
         }
 
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=setting.max_chunk_size,
-            chunk_overlap=setting.chunk_overlap,
-            length_function=len,
-            is_separator_regex=False,
+    async def split_recipes_into_chunks(self, recipes: list[RecipeVector]) -> list[Any]:
+        """Разделение текстов рецептов на чанки с сохранением метаданных (одной задачей в пуле процессов)."""
+        return await cpu_executor.run(
+            split_texts,
+            [recipe.text for recipe in recipes],
+            [self.chunk_metadata(recipe) for recipe in recipes],
+            setting.max_chunk_size,
+            setting.chunk_overlap,
         )
 
-        chunks = text_splitter.create_documents(texts=[recipe.text], metadatas=[metadata])
-        return chunks
-
-    async def add_recipe(self, recipe: RecipeVector):
+    async def add_recipes(self, recipes: list[RecipeVector]) -> None:
+        """
+        Пакетное добавление рецептов: чанки всех рецептов кодируются моделью одним вызовом
+        пакетами по embedding_batch_size и записываются в коллекцию одной операцией.
+        """
         if not self._store:
             raise RuntimeError("ChromaVectorStore is not initialized.")
+        if not recipes:
+            return
         try:
-            logger.info(f"📝 Добавление рецепта в базу данных Chroma: {recipe.metadata.id}")
+            logger.info(f"📝 Добавление рецептов в базу данных Chroma: {[str(r.metadata.id) for r in recipes]}")
 
             # Получение чанков
-            chunks: list[Any] = await self.split_text_into_chunks(recipe)
-            logger.info(f"Документ разбит на {len(chunks)} чанков")
+            chunks: list[Any] = await self.split_recipes_into_chunks(recipes)
+            logger.info(f"Рецепты ({len(recipes)}) разбиты на {len(chunks)} чанков")
 
             # Создаем список документов для Chroma
             documents = [
@@ -157,13 +249,19 @@ class ChromaVectorStore:
                 for chunk in chunks
             ]
 
-            # Добавление документов в хранилище
-            await self._store.aadd_documents(documents=documents)
+            # Добавление документов в хранилище: один вызов embed_documents и одна запись в коллекцию
+            ids = await self._store.aadd_documents(documents=documents)
+            for doc_id, document in zip(ids, documents):
+                self._bm25.add(doc_id, document.page_content, document.metadata)
+            self.version += 1
 
-            logger.info("✅ Рецепт успешно добавлен.")
+            logger.info(f"✅ Рецепты успешно добавлены ({len(recipes)}).")
         except Exception as e:
-            logger.exception(f"❌ Ошибка при добавлении рецепта: {e}")
-            raise ExceptAddChromaError(f"Ошибка при добавлении рецепта: {e}")
+            logger.exception(f"❌ Ошибка при добавлении рецептов: {e}")
+            raise ExceptAddChromaError(f"Ошибка при добавлении рецептов: {e}")
+
+    async def add_recipe(self, recipe: RecipeVector) -> None:
+        await self.add_recipes([recipe])
 
 
 chrome = ChromaVectorStore()
@@ -0,0 +1,168 @@
+import fcntl
+import hashlib
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import IO, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from consumer.core.config import CACHE_DIR, WHITESPACE_PATTERN, configure_logging
+from consumer.core.exceptions import ExceptEmbeddingCacheLockedError
+
+configure_logging(logging.INFO)
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_DIR = CACHE_DIR / "embeddings"
+
+
+def text_key(text: str) -> str:
+    """Хэш нормализованного текста чанка (без учёта регистра и повторных пробелов)."""
+    normalized = WHITESPACE_PATTERN.sub(" ", text).strip().lower()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    Постоянный кэш эмбеддингов одной модели на диске.
+    vectors.f32 — векторы float32 подряд, читаются через memmap; index.tsv — строки «хэш текста<TAB>номер
+    вектора», только дописываются. Вектор записывается раньше строки индекса; после аварийного
+    завершения open обрезает недописанный вектор и удаляет строки индекса без вектора.
+    Рассчитан на одного пишущего (потребитель или инструмент перестроения индекса): open берёт
+    монопольную блокировку файла lock в каталоге кэша и держит её до close.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._vectors_path = path / "vectors.f32"
+        self._index_path = path / "index.tsv"
+        self._index: dict[str, int] = {}
+        self._dim: Optional[int] = None
+        self._rows: int = 0
+        self._matrix: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        self._lock_file: Optional[IO[str]] = None
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def open(self) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        # второй пишущий процесс завершается сразу: иначе оба дописывают векторы под одними номерами
+        lock_file = open(self.path / "lock", "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            raise ExceptEmbeddingCacheLockedError(f"Кэш эмбеддингов {self.path} уже открыт другим процессом")
+        self._lock_file = lock_file
+        dim_path = self.path / "dim"
+        if dim_path.exists():
+            self._dim = int(dim_path.read_text())
+            if self._vectors_path.exists():
+                size = os.path.getsize(self._vectors_path)
+                self._rows = size // (self._dim * 4)
+                if size != self._rows * self._dim * 4:
+                    # недописанный вектор обрезается, иначе следующие векторы запишутся со сдвигом
+                    logger.warning(f"Кэш эмбеддингов {self.path.name}: обрезан недописанный вектор")
+                    os.truncate(self._vectors_path, self._rows * self._dim * 4)
+        if self._index_path.exists():
+            stale = False
+            with open(self._index_path, encoding="utf-8") as file:
+                for line in file:
+                    key, _, row = line.rstrip("\n").partition("\t")
+                    # строка без перевода строки могла оборваться посреди номера вектора
+                    if line.endswith("\n") and row.isdigit() and int(row) < self._rows:
+                        self._index[key] = int(row)
+                    else:
+                        stale = True
+            if stale:
+                # строки на недописанные векторы удаляются из файла: иначе после новых записей
+                # они указывали бы на векторы других текстов
+                self._rewrite_index()
+        logger.info(f"💾 Кэш эмбеддингов {self.path.name}: {len(self._index)} векторов")
+
+    def close(self) -> None:
+        """Снятие блокировки кэша (закрытие файла освобождает flock)."""
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _rewrite_index(self) -> None:
+        tmp_path = self._index_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.writelines(f"{key}\t{row}\n" for key, row in self._index.items())
+        os.replace(tmp_path, self._index_path)
+        logger.warning(f"Кэш эмбеддингов {self.path.name}: из индекса удалены строки на недописанные векторы")
+
+    def _map(self) -> np.memmap:
+        if self._matrix is None or len(self._matrix) < self._rows:
+            self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(self._rows, self._dim))
+        return self._matrix
+
+    def get_many(self, keys: list[str]) -> list[Optional[list[float]]]:
+        with self._lock:
+            rows = [self._index.get(key) for key in keys]
+            matrix = self._map() if any(row is not None for row in rows) else None
+            result = [matrix[row].tolist() if row is not None else None for row in rows]
+        found = sum(vector is not None for vector in result)
+        self.hits += found
+        self.misses += len(keys) - found
+        return result
+
+    def put_many(self, keys: list[str], vectors: list[list[float]]) -> None:
+        if not vectors:
+            return
+        data = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            if self._dim is None:
+                self._dim = data.shape[1]
+                (self.path / "dim").write_text(str(self._dim))
+            new = {key: vector for key, vector in zip(keys, data) if key not in self._index}
+            if not new:
+                return
+            with open(self._vectors_path, "ab") as file:
+                file.write(np.stack(list(new.values())).tobytes())
+            with open(self._index_path, "a", encoding="utf-8") as file:
+                for offset, key in enumerate(new):
+                    file.write(f"{key}\t{self._rows + offset}\n")
+                    self._index[key] = self._rows + offset
+            self._rows += len(new)
+
+    def stats(self) -> dict[str, int]:
+        return {"vectors": len(self._index), "hits": self.hits, "misses": self.misses}
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Эмбеддинги документов через постоянный кэш: модель кодирует только чанки, которых ещё нет в кэше.
+    Эмбеддинги запросов не кэшируются — запросы почти не повторяются.
+    """
+
+    def __init__(self, embeddings: Embeddings, store: EmbeddingStore) -> None:
+        self.embeddings = embeddings
+        self.store = store
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys = [text_key(text) for text in texts]
+        vectors = self.store.get_many(keys)
+        missing = [index for index, vector in enumerate(vectors) if vector is None]
+        if missing:
+            # повторяющиеся в пакете тексты кодируются один раз
+            unique: dict[str, str] = {keys[index]: texts[index] for index in missing}
+            computed = dict(zip(unique, self.embeddings.embed_documents(list(unique.values()))))
+            self.store.put_many(list(computed), list(computed.values()))
+            for index in missing:
+                vectors[index] = computed[keys[index]]
+        return vectors
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embeddings.embed_query(text)
+
+
+def open_embedding_store(model_id: str) -> EmbeddingStore:
+    """Кэш эмбеддингов модели: у каждой модели (и бэкенда) свой каталог, векторы разных моделей не смешиваются."""
+    store = EmbeddingStore(EMBEDDING_CACHE_DIR / model_id.replace("/", "__").replace(":", "_"))
+    store.open()
+    return store
@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from langchain_core.embeddings import Embeddings
+
+from consumer.core.config import configure_logging, setting
+from consumer.core.metrics import metrics
+from consumer.vectoring.models.embedding_cache import CachedEmbeddings
+
+configure_logging(logging.INFO)
+logger = logging.getLogger(__name__)
+
+# границы корзин числа текстов в одном пакете модели
+BATCH_BUCKETS: tuple[float, ...] = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+embedding_batch_texts = metrics.histogram(
+    "embedding_batch_texts", "Number of texts encoded by the embedding model in one batch", BATCH_BUCKETS
+)
+
+
+class EncodeRequest:
+    def __init__(self, texts: list[str], query: bool, future: asyncio.Future) -> None:
+        self.texts = texts
+        self.query = query
+        self.future = future
+
+
+class BatchingEmbeddings(Embeddings):
+    """
+    Эмбеддинги через отдельный поток-воркер с микропакетами: запросы на кодирование,
+    пришедшие почти одновременно (в пределах embedding_worker_max_wait_ms или до
+    embedding_worker_batch_size текстов), кодируются моделью одним пакетом, и каждый
+    вызывающий получает свою часть результата.
+    Синхронные методы (их вызывает Chroma из потоков) передают запрос тому же воркеру.
+    Модель считается симметричной: запрос кодируется так же, как документ (без префиксов).
+    """
+
+    def __init__(self, embeddings: Embeddings) -> None:
+        self.embeddings = embeddings
+        self._queue: Optional[asyncio.Queue[EncodeRequest]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding")
+        self._task = asyncio.create_task(self._run())
+        logger.info("🧵 Воркер эмбеддингов запущен")
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        while not self._queue.empty():
+            request = self._queue.get_nowait()
+            if not request.future.done():
+                request.future.set_exception(RuntimeError("Воркер эмбеддингов остановлен"))
+        self._executor.shutdown(wait=True)
+        self._task = self._queue = self._executor = None
+        logger.info("🧵 Воркер эмбеддингов остановлен")
+
+    async def _submit(self, texts: list[str], query: bool) -> list[list[float]]:
+        if self._task is None:
+            # воркер не запущен (инструменты, тесты): кодирование в потоке без пакетирования
+            if query:
+                return [await asyncio.to_thread(self.embeddings.embed_query, texts[0])]
+            return await asyncio.to_thread(self.embeddings.embed_documents, texts)
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(EncodeRequest(texts, query, future))
+        return await future
+
+    async def _collect(self) -> list[EncodeRequest]:
+        """Первый запрос из очереди и все, что придут за время ожидания, пока пакет не заполнится."""
+        config = setting.embedding
+        batch = [await self._queue.get()]
+        size = len(batch[0].texts)
+        deadline = self._loop.time() + config.embedding_worker_max_wait_ms / 1000
+        while size < config.embedding_worker_batch_size:
+            timeout = deadline - self._loop.time()
+            try:
+                if timeout > 0:
+                    request = await asyncio.wait_for(self._queue.get(), timeout)
+                else:
+                    # время ожидания вышло, но уже пришедшие запросы попадают в пакет
+                    request = self._queue.get_nowait()
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                break
+            batch.append(request)
+            size += len(request.texts)
+        return batch
+
+    def _encode(self, queries: list[str], documents: list[str]) -> tuple[list[list[float]], list[list[float]]]:
+        # запросы кодируются моделью напрямую: в кэш эмбеддингов попадают только документы
+        model = self.embeddings.embeddings if isinstance(self.embeddings, CachedEmbeddings) else self.embeddings
+        query_vectors = model.embed_documents(queries) if queries else []
+        document_vectors = self.embeddings.embed_documents(documents) if documents else []
+        return query_vectors, document_vectors
+
+    async def _run(self) -> None:
+        while True:
+            batch = [request for request in await self._collect() if not request.future.done()]
+            queries = [text for request in batch if request.query for text in request.texts]
+            documents = [text for request in batch if not request.query for text in request.texts]
+            if not batch:
+                continue
+            embedding_batch_texts.observe(len(queries) + len(documents))
+            try:
+                query_vectors, document_vectors = await self._loop.run_in_executor(
+                    self._executor, self._encode, queries, documents
+                )
+            except Exception as e:
+                logger.exception(f"❌ Ошибка кодирования пакета эмбеддингов: {e}")
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                continue
+
+            offsets = {True: 0, False: 0}
+            for request in batch:
+                vectors = query_vectors if request.query else document_vectors
+                start = offsets[request.query]
+                offsets[request.query] = start + len(request.texts)
+                if not request.future.done():
+                    request.future.set_result(vectors[start : start + len(request.texts)])
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return (await self._submit([text], query=True))[0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        return await self._submit(texts, query=False)
+
+    def _call_from_thread(self, texts: list[str], query: bool) -> Optional[list[list[float]]]:
+        # из потока цикла событий ждать воркер нельзя (взаимная блокировка) — тогда кодирование на месте
+        if self._task is None or threading.get_ident() == self._loop_thread:
+            return None
+        return asyncio.run_coroutine_threadsafe(self._submit(texts, query), self._loop).result()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        vectors = self._call_from_thread(texts, query=False) if texts else []
+        return vectors if vectors is not None else self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        vectors = self._call_from_thread([text], query=True)
+        return vectors[0] if vectors is not None else self.embeddings.embed_query(text)
@@ -0,0 +1,84 @@
+import logging
+from pathlib import Path
+
+from langchain_core.embeddings import Embeddings
+
+from consumer.core.config import CACHE_DIR, configure_logging, setting
+from consumer.vectoring.models.embedding_cache import CachedEmbeddings, open_embedding_store
+from consumer.vectoring.models.embedding_worker import BatchingEmbeddings
+
+configure_logging(logging.INFO)
+logger = logging.getLogger(__name__)
+
+ONNX_DIR = CACHE_DIR / "onnx"
+
+
+def onnx_int8_model(model_name: str, quantization: str) -> tuple[Path, str]:
+    """
+    Экспорт модели в ONNX с динамической int8-квантизацией весов.
+    Выполняется один раз: результат сохраняется в CACHE_DIR/onnx и при следующих запусках
+    загружается без PyTorch-инференса. Возвращает каталог модели и путь к файлу ONNX внутри него.
+    """
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    model_dir = ONNX_DIR / model_name.replace("/", "__")
+    file_name = f"onnx/model_qint8_{quantization}.onnx"
+    if not (model_dir / file_name).exists():
+        logger.info(f"Экспорт модели {model_name} в ONNX (int8, {quantization})...")
+        model = SentenceTransformer(model_name, device="cpu", backend="onnx")
+        model.save_pretrained(str(model_dir))
+        export_dynamic_quantized_onnx_model(model, quantization, str(model_dir))
+    return model_dir, file_name
+
+
+def embedding_model_id() -> str:
+    """Идентификатор модели вместе с бэкендом: int8-векторы отличаются от векторов исходной модели."""
+    config = setting.embedding
+    if config.embedding_backend == "onnx_int8":
+        return f"{config.embedding_model}:onnx_int8_{config.embedding_onnx_quantization}"
+    return config.embedding_model
+
+
+def create_embeddings() -> Embeddings:
+    """
+    Модель эмбеддингов по настройке embedding_backend, при embedding_cache_enabled — через
+    постоянный кэш эмбеддингов документов, при embedding_worker_enabled — через воркер с микропакетами
+    (его запускает ChromaVectorStore.init):
+    torch — исходная модель в PyTorch (на GPU, если он есть);
+    onnx_int8 — та же модель в ONNX Runtime с int8-весами: на CPU быстрее и занимает меньше памяти.
+    """
+    embeddings = create_model_embeddings()
+    if setting.embedding.embedding_cache_enabled:
+        embeddings = CachedEmbeddings(embeddings, open_embedding_store(embedding_model_id()))
+    if setting.embedding.embedding_worker_enabled:
+        embeddings = BatchingEmbeddings(embeddings)
+    return embeddings
+
+
+def create_model_embeddings() -> Embeddings:
+    # библиотеки модели импортируются при создании эмбеддингов, а не при импорте модуля;
+    # PyTorch напрямую нужен только бэкенду torch (выбор устройства)
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    config = setting.embedding
+    encode_kwargs = {"normalize_embeddings": True, "batch_size": config.embedding_batch_size}
+
+    if config.embedding_backend == "onnx_int8":
+        model_dir, file_name = onnx_int8_model(config.embedding_model, config.embedding_onnx_quantization)
+        logger.info(f"🚀 Эмбеддинги: ONNX Runtime, {file_name}")
+        return HuggingFaceEmbeddings(
+            model_name=str(model_dir),
+            model_kwargs={"device": "cpu", "backend": "onnx", "model_kwargs": {"file_name": file_name}},
+            encode_kwargs=encode_kwargs,
+        )
+
+    import torch
+
+    # Определяем устройство для вычислений: GPU если доступен, иначе CPU
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    logger.info(f"🚀 Используем устройство для эмбеддингов: {device}")
+    return HuggingFaceEmbeddings(
+        model_name=config.embedding_model,
+        model_kwargs={"device": device},
+        encode_kwargs=encode_kwargs,
+    )
@@ -0,0 +1,76 @@
+"""
+Перестроение коллекции Chroma по рецептам из MongoDB.
+
+Коллекция очищается, рецепты читаются пакетами и добавляются через ChromaVectorStore.add_recipes.
+Эмбеддинги берутся из того же постоянного кэша, что и при добавлении рецептов потребителем,
+поэтому модель кодирует только изменившиеся тексты. Потребитель на время перестроения
+нужно остановить: кэш эмбеддингов рассчитан на одного пишущего.
+
+Запуск из корня репозитория:
+    python -m consumer.vectoring.rebuild_index --batch 64
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+from consumer.core.config import configure_logging
+from consumer.core.database import MongoManager
+from consumer.core.exceptions import ExceptNormalizeTextError
+from consumer.core.executor import cpu_executor
+from consumer.utils.preparation_docs import recipe_to_metadata
+from consumer.vectoring.models.chroma import RecipeVector, chrome
+
+configure_logging(logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def rebuild(batch_size: int) -> None:
+    mongo = MongoManager()
+    await mongo.connect()
+    await cpu_executor.start()
+    await chrome.init()
+    try:
+        start = time.perf_counter()
+        await chrome.reset()
+        recipe_collection = mongo.get_collection("recipes")
+
+        total, skipped, last_id = 0, 0, None
+        while True:
+            query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+            recipes = await recipe_collection.find(query).sort("_id", 1).to_list(length=batch_size)
+            if not recipes:
+                break
+            last_id = recipes[-1]["_id"]
+
+            batch: list[RecipeVector] = []
+            for recipe in recipes:
+                try:
+                    batch.append(await recipe_to_metadata(recipe, recipe["_id"]))
+                except ExceptNormalizeTextError as e:
+                    logger.warning(f"Рецепт {recipe['_id']} пропущен: {e}")
+                    skipped += 1
+            await chrome.add_recipes(batch)
+            total += len(batch)
+            logger.info(f"Добавлено рецептов: {total}")
+
+        logger.info(
+            f"✅ Индекс перестроен за {time.perf_counter() - start:.1f} сек: {total} рецептов, пропущено {skipped}, "
+            f"кэш эмбеддингов: {chrome.embedding_cache_stats()}"
+        )
+    finally:
+        await chrome.close()
+        await cpu_executor.shutdown()
+        await mongo.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch", type=int, default=64, help="число рецептов в одном пакете add_recipes")
+    args = parser.parse_args()
+    asyncio.run(rebuild(args.batch))
+
+
+if __name__ == "__main__":
+    main()
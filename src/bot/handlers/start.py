@@ -9,6 +9,8 @@ from aiogram.types import Message
 
 from src.core.config import URL_PATTERN, configure_logging, broker
 from src.core.database import MongoManager
+from src.utils.inflight import inflight_registry
+from src.utils.url import url_canonicalizer
 
 router = Router()
 
@@ -101,7 +103,10 @@ async def handle_http_url(message: Message, mongo: MongoManager) -> None:
         await message.reply("Не удалось найти ссылку в сообщении.")
         return
 
-    url: str = url_text[0]
+    # дубли ищутся по каноническому адресу: короткие ссылки, utm-метки и т.п. не создают новый рецепт;
+    # страницу потребитель загружает по fetch_url (канонический адрес без www. открывается не везде)
+    resolved = await url_canonicalizer.resolve(url_text[0])
+    url: str = resolved.canonical
     logger.info(f"Добавление в группу '{chat_title}' пользователем {user_name} новой ссылки: {url}")
 
     recipe_collection = mongo.get_collection("recipes")
@@ -122,17 +127,26 @@ async def handle_http_url(message: Message, mongo: MongoManager) -> None:
         else:
             logger.info("Рецепт уже содержит данные этого пользователя и чата.")
 
-    else:
-        await broker.publish(
-            {
-                "url": url,
-                "user_id": message.from_user.id,
-                "chat_id": message.chat.id,
-            },
-            queue="recipe_processing_queue",
-        )
+    elif await inflight_registry.acquire(url, user_id=user_id, chat_id=chat_id):
+        try:
+            await broker.publish(
+                {
+                    "url": url,
+                    "fetch_url": resolved.fetch_url,
+                    "user_id": message.from_user.id,
+                    "chat_id": message.chat.id,
+                },
+                queue="recipe_processing_queue",
+            )
+        except Exception:
+            await inflight_registry.release(url)
+            raise
         await message.answer("📊 Запрос отправлен!")
 
+    else:
+        # ссылку уже обрабатывают по запросу другого участника, ждём результат той же задачи
+        await message.answer("⏳ Этот рецепт уже обрабатывается, сообщу, когда он будет добавлен.")
+
 
 @router.message(F.chat.type.in_(["group", "supergroup"]), F.text)
 async def handle_group_message(message: Message) -> None:
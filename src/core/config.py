@@ -110,12 +110,26 @@ class RabitMQSettings(BaseSettings):
         return f"amqp://{self.rabbitmq_default_user}:{self.rabbitmq_default_pass}@{self.rabbitmq_default_host}:{self.rabbitmq_default_port}/"
 
 
+class UrlSettings(BaseSettings):
+    url_resolve_timeout: float = Field(default=5.0, description="Timeout of following URL redirects, sec")
+    url_canonical_ttl: int = Field(default=30 * 24 * 3600, description="Lifetime of URL -> canonical URL record, sec")
+    url_inflight_ttl: int = Field(default=15 * 60, description="Max time of URL processing in the consumer, sec")
+
+    model_config = SettingsConfigDict(
+        env_file=BASE_DIR / ".env",
+        env_file_encoding="utf-8",
+        extra="ignore",  # игнорирование наличия других полей в .env - файле
+        case_sensitive=False,  # регистронезависимость
+    )
+
+
 class Setting(BaseModel):
     llm: LlmSettings = LlmSettings()
     bot: BotSettings = BotSettings()
     redis: RedisSettings = RedisSettings()
     mongo: MongoSettings = MongoSettings()
     rabbitmq: RabitMQSettings = RabitMQSettings()
+    url: UrlSettings = UrlSettings()
 
 
 setting = Setting()
@@ -7,6 +7,7 @@ from src.bot.handlers.chat_recipe import router as chat_recipe
 from src.bot.handlers.start import router as start_router
 from src.core.config import bot, configure_logging, dp, broker
 from src.core.database import mongo_manager, mongo_middleware
+from src.utils.url import url_canonicalizer
 
 configure_logging(logging.INFO)
 logger = logging.getLogger(__name__)
@@ -36,6 +37,7 @@ async def main():
 
         await broker.close()
         await mongo_manager.close()
+        await url_canonicalizer.close()
         if bot.session:
             await bot.session.close()
 
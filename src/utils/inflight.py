@@ -0,0 +1,53 @@
+import json
+import logging
+
+from src.core.config import configure_logging, setting, storage
+
+configure_logging(logging.INFO)
+logger = logging.getLogger(__name__)
+
+INFLIGHT_KEY_PREFIX = "inflight:"
+WAITERS_KEY_SUFFIX = ":waiters"
+
+# атомарно: если URL уже обрабатывается — добавляем запросившего в ожидающие,
+# иначе занимаем URL под новую задачу
+ACQUIRE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('SADD', KEYS[2], ARGV[1])
+    redis.call('EXPIRE', KEYS[2], ARGV[2])
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return 1
+"""
+
+
+class InflightRegistry:
+    """
+    Реестр ссылок, которые сейчас обрабатывает потребитель, по каноническому URL.
+    Повторная ссылка не порождает новую задачу: запросивший добавляется в список
+    ожидающих и получает уведомление, когда потребитель закончит обработку.
+    """
+
+    def __init__(self) -> None:
+        self._acquire = storage.redis.register_script(ACQUIRE_SCRIPT)
+
+    async def acquire(self, url: str, user_id: int, chat_id: int) -> bool:
+        """True — задача для URL создаётся этим вызовом, False — URL уже в обработке."""
+        requester = json.dumps({"user_id": user_id, "chat_id": chat_id})
+        key = INFLIGHT_KEY_PREFIX + url
+        acquired = await self._acquire(
+            keys=[key, key + WAITERS_KEY_SUFFIX],
+            args=[requester, setting.url.url_inflight_ttl],
+        )
+        if not acquired:
+            logger.info(f"Ссылка {url} уже обрабатывается, пользователь {user_id} добавлен в ожидающие")
+        return bool(acquired)
+
+    async def release(self, url: str) -> None:
+        """Освобождение URL, если задачу не удалось поставить в очередь."""
+        key = INFLIGHT_KEY_PREFIX + url
+        await storage.redis.delete(key, key + WAITERS_KEY_SUFFIX)
+
+
+inflight_registry = InflightRegistry()
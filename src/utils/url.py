@@ -0,0 +1,143 @@
+import asyncio
+import logging
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import aiohttp
+from pydantic import BaseModel, Field
+from redis.exceptions import RedisError
+
+from src.core.config import configure_logging, setting, storage
+
+configure_logging(logging.INFO)
+logger = logging.getLogger(__name__)
+
+# параметры, которые добавляют рекламные сети и соцсети, на содержимое страницы не влияют
+TRACKING_PARAMS = frozenset(
+    {
+        "fbclid",
+        "gclid",
+        "yclid",
+        "ysclid",
+        "mc_cid",
+        "mc_eid",
+        "igshid",
+        "_openstat",
+        "ref",
+        "from",
+    }
+)
+TRACKING_PREFIXES = ("utm_",)
+DEFAULT_PORTS = {"http": 80, "https": 443}
+CANONICAL_KEY_PREFIX = "url:canonical:"
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+
+
+def normalize_url(url: str) -> str:
+    """
+    Нормализация URL без сетевых запросов: схема и хост в нижнем регистре,
+    без www., порта по умолчанию, фрагмента, трекинговых параметров и завершающего слэша.
+    Должна совпадать с consumer.utils.url.canonicalize_url (ключ кэша страниц потребителя):
+    сервисы не импортируют код друг друга, поэтому функция продублирована.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower() or "http"
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+
+    netloc = host
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{host}:{parts.port}"
+
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+
+    query_items = [
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    ]
+    query = urlencode(sorted(query_items))
+
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+class ResolvedUrl(BaseModel):
+    fetch_url: str = Field(..., description="адрес загрузки страницы: конечный адрес редиректов или исходная ссылка")
+    canonical: str = Field(..., description="канонический адрес: ключ поиска дублей, обработки и кэша страниц")
+
+
+class UrlCanonicalizer:
+    """
+    Приведение ссылок на рецепты к каноническому виду перед поиском дублей.
+    Цепочка редиректов (короткие ссылки share.google, http -> https и т.п.) проходится
+    один раз, результат хранится в Redis с TTL.
+    """
+
+    def __init__(self) -> None:
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=setting.url.url_resolve_timeout),
+                headers={"User-Agent": USER_AGENT},
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _follow_redirects(self, url: str) -> Optional[str]:
+        """Адрес, на который в итоге ведёт ссылка; None, если пройти редиректы не удалось."""
+        try:
+            async with self.session.head(url, allow_redirects=True) as response:
+                if response.status < 400:
+                    return str(response.url)
+            # не все сайты поддерживают HEAD
+            async with self.session.get(url, allow_redirects=True) as response:
+                return str(response.url)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f"Не удалось пройти редиректы для {url}: {e}")
+            return None
+
+    async def resolve(self, url: str) -> ResolvedUrl:
+        """
+        Адрес для загрузки страницы и канонический адрес ссылки. Канонический адрес без www.
+        и параметров годится только как ключ: страница загружается по адресу, на который
+        ведут редиректы (в Redis хранится он, канонический вычисляется из него).
+        """
+        key = CANONICAL_KEY_PREFIX + normalize_url(url)
+
+        try:
+            cached = await storage.redis.get(key)
+        except RedisError as e:
+            logger.warning(f"Redis недоступен, канонический URL не кэшируется: {e}")
+            cached = None
+        if cached:
+            resolved = cached.decode() if isinstance(cached, bytes) else cached
+            return ResolvedUrl(fetch_url=resolved, canonical=normalize_url(resolved))
+
+        # редиректы проходятся по исходной ссылке: у части сайтов адрес без www. не открывается
+        resolved = await self._follow_redirects(url.strip())
+        if resolved is None:
+            # сбой может быть временным: адрес без прохода редиректов не кэшируется
+            return ResolvedUrl(fetch_url=url.strip(), canonical=normalize_url(url))
+
+        try:
+            await storage.redis.set(key, resolved, ex=setting.url.url_canonical_ttl)
+        except RedisError as e:
+            logger.warning(f"Не удалось сохранить канонический URL в Redis: {e}")
+
+        result = ResolvedUrl(fetch_url=resolved, canonical=normalize_url(resolved))
+        if result.canonical != normalize_url(url):
+            logger.info(f"Ссылка {url} приведена к {result.canonical}")
+        return result
+
+
+url_canonicalizer = UrlCanonicalizer()
@@ -0,0 +1,170 @@
+import os
+import sys
+import types
+import unittest
+from typing import Any
+from unittest import mock
+
+from bson import ObjectId
+from pydantic import BaseModel
+
+os.environ.setdefault("OPENROUTER_API_KEY", "test")
+os.environ.setdefault("BOT_TOKEN", "123:test")
+
+
+# векторное хранилище и подготовка текста для него тянут torch и модель эмбеддингов — в тестах заглушки
+class RecipeMetadate(BaseModel):
+    id: str
+    ingredients: dict[str, Any]
+
+
+class RecipeVector(BaseModel):
+    text: str
+    metadata: RecipeMetadate
+
+
+class FakeChroma:
+    def __init__(self) -> None:
+        self.added: list[RecipeVector] = []
+
+    async def add_recipes(self, recipes: list[RecipeVector]) -> None:
+        self.added.extend(recipes)
+
+
+async def recipe_to_metadata(recipe: dict[str, Any], id_recipe: ObjectId) -> RecipeVector:
+    metadata = RecipeMetadate(id=str(id_recipe), ingredients=recipe["ingredients"])
+    return RecipeVector(text=recipe["title"], metadata=metadata)
+
+
+chroma_module = types.ModuleType("consumer.vectoring.models.chroma")
+chroma_module.RecipeVector = RecipeVector
+chroma_module.chrome = FakeChroma()
+preparation_module = types.ModuleType("consumer.utils.preparation_docs")
+preparation_module.recipe_to_metadata = recipe_to_metadata
+sys.modules.setdefault(chroma_module.__name__, chroma_module)
+sys.modules.setdefault(preparation_module.__name__, preparation_module)
+
+from consumer.core.exceptions import ExceptLlmUnavailableError  # noqa: E402
+from consumer.core.page import CachedPage  # noqa: E402
+from consumer.llm import agents  # noqa: E402
+from consumer.utils import parser  # noqa: E402
+
+# рецепт на стыке двух сегментов: ингредиенты в первом, шаги приготовления во втором
+FIRST_PART = {"title": "Борщ", "category": "Супы", "ingredients": {"свёкла": "1 шт"}, "description": []}
+SECOND_PART = {"title": "Борщ", "category": "Супы", "ingredients": {"капуста": "300 г"}, "description": ["Варить"]}
+MERGED = {
+    "title": "Борщ",
+    "category": "Супы",
+    "ingredients": {"свёкла": "1 шт", "капуста": "300 г"},
+    "description": ["Варить"],
+}
+
+
+class FakeCollection:
+    def __init__(self) -> None:
+        self.docs: dict[ObjectId, dict[str, Any]] = {}
+
+    async def insert_one(self, document: dict[str, Any]) -> types.SimpleNamespace:
+        inserted_id = ObjectId()
+        self.docs[inserted_id] = {**document, "_id": inserted_id}
+        return types.SimpleNamespace(inserted_id=inserted_id)
+
+    async def update_one(self, query: dict[str, Any], update: dict[str, Any]) -> None:
+        self.docs[query["_id"]].update(update["$set"])
+
+    async def delete_many(self, query: dict[str, Any]) -> types.SimpleNamespace:
+        ids = [recipe_id for recipe_id in query["_id"]["$in"] if recipe_id in self.docs]
+        for recipe_id in ids:
+            del self.docs[recipe_id]
+        return types.SimpleNamespace(deleted_count=len(ids))
+
+
+class FakeMongo:
+    def __init__(self) -> None:
+        self.recipes = FakeCollection()
+
+    def get_collection(self, name: str) -> FakeCollection:
+        return self.recipes
+
+
+class FakeBot:
+    async def send_message(self, *args: Any, **kwargs: Any) -> None:
+        pass
+
+
+class StreamingAgent:
+    """Агент, который успел выдать потоком часть рецепта, а в итоге вернул объединённый рецепт."""
+
+    async def classify_stream(self, url: str):
+        yield "recipe", FIRST_PART
+        yield "result", {"status": "Ok", "recipes": [MERGED]}
+
+
+class UnavailableAgent:
+    """Агент, у которого провайдер LLM отказал после первого выданного потоком рецепта."""
+
+    async def classify_stream(self, url: str):
+        yield "recipe", FIRST_PART
+        raise ExceptLlmUnavailableError("провайдер недоступен")
+
+
+class RecipeAcrossSegmentsTest(unittest.IsolatedAsyncioTestCase):
+    async def test_segments_are_not_streamed_and_merged(self) -> None:
+        streamed: list[dict[str, Any]] = []
+        parts = iter([[FIRST_PART], [SECOND_PART]])
+
+        async def parse_segment(content: str, on_recipe=None) -> list[dict[str, Any]]:
+            recipes = next(parts)
+            if on_recipe is not None:
+                for recipe in recipes:
+                    on_recipe(recipe)
+            return recipes
+
+        node_self = types.SimpleNamespace(_parse_segment=parse_segment)
+        page = CachedPage(body="", content="Борщ\nсвёкла 1 шт\n\nБорщ\nкапуста 300 г\nВарить")
+        state = {"url": "https://example.com/borsch", "page": page, "page_from_cache": True}
+
+        with (
+            mock.patch.object(agents, "get_stream_writer", return_value=lambda chunk: streamed.append(chunk)),
+            mock.patch.object(agents, "split_into_segments", return_value=["first", "second"]),
+        ):
+            result = await agents.ParsingAgent._parsing_site_ai_node(node_self, state)
+
+        self.assertEqual(streamed, [])
+        self.assertEqual(result["recipes"], [MERGED])
+
+    async def test_merged_recipe_replaces_streamed_part(self) -> None:
+        mongo = FakeMongo()
+        chroma = FakeChroma()
+
+        with (
+            mock.patch.object(parser, "agent_registry", types.SimpleNamespace(parsing=StreamingAgent())),
+            mock.patch.object(parser, "chrome", chroma),
+        ):
+            await parser.process_recipe(FakeBot(), 1, 1, "https://example.com/borsch", mongo)
+
+        docs = list(mongo.recipes.docs.values())
+        self.assertEqual(len(docs), 1)
+        self.assertEqual(docs[0]["ingredients"], MERGED["ingredients"])
+        self.assertEqual(docs[0]["description"], MERGED["description"])
+        self.assertEqual([vector.metadata.ingredients for vector in chroma.added], [MERGED["ingredients"]])
+
+
+class RequeueTest(unittest.IsolatedAsyncioTestCase):
+    async def test_partial_saves_are_discarded_before_requeue(self) -> None:
+        mongo = FakeMongo()
+        chroma = FakeChroma()
+
+        with (
+            mock.patch.object(parser, "agent_registry", types.SimpleNamespace(parsing=UnavailableAgent())),
+            mock.patch.object(parser, "chrome", chroma),
+        ):
+            with self.assertRaises(ExceptLlmUnavailableError):
+                await parser.process_recipe(FakeBot(), 1, 1, "https://example.com/borsch", mongo)
+
+        self.assertEqual(mongo.recipes.docs, {})
+        self.assertEqual(chroma.added, [])
+
+
+if __name__ == "__main__":
+    unittest.main()